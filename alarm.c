@@ -3,6 +3,7 @@
 #include <unistd.h>
 #include <signal.h>
 #include <setjmp.h>
+#include <sys/time.h>
 
 static jmp_buf jump_buffer;
 
@@ -11,14 +12,17 @@ void alarm_handler(int sig) {
     longjmp(jump_buffer, 1);
 }
 
-void my_wait(int seconds) {
+void my_wait(double seconds) {
     // Set up the alarm handler
     signal(SIGALRM, alarm_handler);
     
     // Set the jump point
     if (setjmp(jump_buffer) == 0) {
         // First time through - set alarm and start infinite loop
-        alarm(seconds);
+        // (same as alarm(), but with microsecond resolution)
+        long micros = (long) (seconds * 1e6 + 0.5);
+        struct itimerval timer = {{0, 0}, {micros / 1000000, micros % 1000000}};
+        setitimer(ITIMER_REAL, &timer, NULL);
         while (1);
     }
 }
@@ -1,6 +1,6 @@
 #include "main.h"
 
-void my_wait(int seconds) {
+void my_wait(double seconds) {
     clock_t end_time = clock() + seconds * CLOCKS_PER_SEC;
     while (clock() < end_time) {
         for (int i = 0; i < 1000000; i++) {
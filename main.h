@@ -1,8 +1,29 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <time.h>
+#include <unistd.h>
 
-void my_wait(int seconds);
+void my_wait(double seconds);
+
+// Enable or disable perf's counters via its --control file descriptors (if given),
+// so that only the wait phase is measured
+static void perf_control(const char *command) {
+    const char *ctl_fd = getenv("WASTE_CPU_PERF_CTL_FD");
+    const char *ack_fd = getenv("WASTE_CPU_PERF_ACK_FD");
+    if (ctl_fd == NULL) {
+        return;
+    }
+    if (write(atoi(ctl_fd), command, strlen(command)) < 0) {
+        return;
+    }
+    if (ack_fd != NULL) {
+        char ack[8];
+        if (read(atoi(ack_fd), ack, sizeof(ack)) < 0) { // Wait until perf applied the command
+            return;
+        }
+    }
+}
 
 int main(int argc, char *argv[]) {
     if (argc != 2) {
@@ -10,10 +31,12 @@ int main(int argc, char *argv[]) {
         return 1;
     }
 
-    int seconds = atoi(argv[1]); // Parse argument to int
-    printf("Waiting for %d seconds...\n", seconds);
+    double seconds = strtod(argv[1], NULL); // Parse argument, fractions like 0.25 allowed
+    printf("Waiting for %g seconds...\n", seconds);
 
+    perf_control("enable\n");
     my_wait(seconds);
+    perf_control("disable\n");
 
     printf("Done!\n");
     return 0;
@@ -7,7 +7,7 @@ long own_clock_nanos() {
     return ts.tv_sec * 1e9 + ts.tv_nsec;
 }
 
-void my_wait(int seconds) {
+void my_wait(double seconds) {
     long end_time = own_clock_nanos() + seconds * 1e9;
     while (own_clock_nanos() < end_time) {
         // cpu wasting loop
@@ -1,7 +1,7 @@
 #include "main.h"
 
 // see https://stackoverflow.com/a/49353441
-__attribute__((optnone, optimize(0))) void my_wait(int seconds) {
+__attribute__((optnone, optimize(0))) void my_wait(double seconds) {
     clock_t end_time = clock() + seconds * CLOCKS_PER_SEC;
     while (clock() < end_time) {
         for (int i = 0; i < 1000000; i++);
@@ -5,11 +5,598 @@ waste-cpu Experiments Manager
 A utility script to compile, view, and benchmark CPU-wasting implementations.
 """
 import os
+import random
 import sys
 import argparse
+import array
+import collections
+import contextlib
+import ctypes
+import dataclasses
+import hashlib
+import math
+import re
+import shutil
+import sqlite3
 import subprocess
 
 
+try:
+    import numpy as np
+except ImportError:  # optional, only speeds up aggregation
+    np = None
+
+# Field separator for perf stat -x output (commas clash with some unit strings)
+PERF_CSV_SEPARATOR = ";"
+
+# Hardware/software counters measured in the default (non-syscall) mode; the cache
+# counters are left to the direct backend so the core counters are not multiplexed
+PERF_SOFTWARE_EVENTS = ["task-clock", "context-switches", "cpu-migrations", "page-faults"]
+PERF_HARDWARE_EVENTS = ["cycles", "instructions", "branches", "branch-misses"]
+PERF_COUNTER_EVENTS = PERF_SOFTWARE_EVENTS + PERF_HARDWARE_EVENTS
+
+# Metrics shown with three decimals, like percentages
+RATIO_METRICS = {"insn_per_cycle", "steady_insn_per_cycle", "start_ghz", "steady_ghz"}
+
+# Interval mode: IPC within this relative tolerance of its steady state counts as warmed up
+WARMUP_TOLERANCE = 0.05
+
+# Tracepoints counting the total and the individual syscalls
+PERF_SYSCALL_EVENTS = ["raw_syscalls:sys_enter", "syscalls:sys_enter_*"]
+
+# perf tool events reporting times, mapped to metric names
+PERF_TIME_EVENTS = {"duration_time": "time_elapsed", "user_time": "user_time",
+                    "system_time": "sys_time", "task-clock": "task_time"}
+PERF_TIME_UNITS = {"ns": 1e9, "usec": 1e6, "us": 1e6, "msec": 1e3, "ms": 1e3, "s": 1.0}
+
+# Two-sided 95% Student's t critical values for 1 to 30 degrees of freedom
+T_CRITICAL_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+# Function every variant implements the waiting in, and the timing functions it may poll
+WAIT_FUNCTION = "my_wait"
+CLOCK_FUNCTIONS = {"clock", "clock_gettime", "__clock_gettime", "gettimeofday", "time", "own_clock_nanos"}
+CALL_MNEMONICS = {"call", "callq", "bl", "blr", "jal", "jalr"}
+
+# Simple loop cost model: sustained instructions per cycle and store-to-load forwarding latency
+COST_ISSUE_WIDTH = 4
+COST_STORE_FORWARD_LATENCY = 5
+
+# One counter line of perf stat -x output
+PerfCounter = collections.namedtuple("PerfCounter", "event value unit run_time pct_running")
+
+# perf_event_open(2) constants for the direct backend
+PERF_TYPE_HARDWARE = 0
+PERF_HW_EVENTS = {"cycles": 0, "instructions": 1, "cache-references": 2,
+                  "cache-misses": 3, "branches": 4, "branch-misses": 5}
+PERF_FORMAT_TOTAL_TIME_ENABLED = 1 << 0
+PERF_FORMAT_TOTAL_TIME_RUNNING = 1 << 1
+PERF_ATTR_FLAG_DISABLED = 1 << 0
+PERF_ATTR_FLAG_INHERIT = 1 << 1
+PERF_ATTR_FLAG_EXCLUDE_KERNEL = 1 << 5
+PERF_ATTR_FLAG_EXCLUDE_HV = 1 << 6
+PERF_ATTR_FLAG_ENABLE_ON_EXEC = 1 << 12
+PERF_EVENT_OPEN_SYSCALLS = {"x86_64": 298, "i386": 336, "i686": 336, "aarch64": 241,
+                            "armv7l": 364, "riscv64": 241, "ppc64le": 319, "s390x": 331}
+
+
+class PerfEventAttr(ctypes.Structure):
+    """struct perf_event_attr (PERF_ATTR_SIZE_VER5 layout)."""
+    _fields_ = [
+        ("type", ctypes.c_uint32),
+        ("size", ctypes.c_uint32),
+        ("config", ctypes.c_uint64),
+        ("sample_period", ctypes.c_uint64),
+        ("sample_type", ctypes.c_uint64),
+        ("read_format", ctypes.c_uint64),
+        ("flags", ctypes.c_uint64),
+        ("wakeup_events", ctypes.c_uint32),
+        ("bp_type", ctypes.c_uint32),
+        ("config1", ctypes.c_uint64),
+        ("config2", ctypes.c_uint64),
+        ("branch_sample_type", ctypes.c_uint64),
+        ("sample_regs_user", ctypes.c_uint64),
+        ("sample_stack_user", ctypes.c_uint32),
+        ("clockid", ctypes.c_int32),
+        ("sample_regs_intr", ctypes.c_uint64),
+        ("aux_watermark", ctypes.c_uint32),
+        ("sample_max_stack", ctypes.c_uint16),
+        ("reserved_2", ctypes.c_uint16),
+    ]
+
+
+class RunningStats:
+    """Incrementally updated mean, variance (Welford's algorithm), min and max.
+    
+    With a reservoir_size, a uniform random sample of at most that many values
+    is kept (reservoir sampling) to estimate percentiles in constant memory.
+    """
+    
+    def __init__(self, reservoir_size=0, seed=None):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.reservoir_size = reservoir_size
+        self.reservoir = []
+        self._random = random.Random(seed)
+    
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        
+        if len(self.reservoir) < self.reservoir_size:
+            self.reservoir.append(value)
+        elif self.reservoir_size:
+            slot = self._random.randrange(self.count)
+            if slot < self.reservoir_size:
+                self.reservoir[slot] = value
+    
+    def percentile(self, q):
+        """Estimate the q-th percentile (0-100) from the reservoir sample."""
+        if not self.reservoir:
+            return None
+        return _percentile(sorted(self.reservoir), q)
+    
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+    
+    @property
+    def stdev(self):
+        return self.variance ** 0.5
+    
+    def relative_ci(self):
+        """Half-width of the 95% confidence interval of the mean in percent of the mean."""
+        if self.count < 2 or self.mean == 0:
+            return float("inf")
+        df = self.count - 1
+        t = T_CRITICAL_95[df - 1] if df <= len(T_CRITICAL_95) else 1.96 + 2.4 / df
+        return t * self.stdev / self.count ** 0.5 / abs(self.mean) * 100
+
+
+class RunTable:
+    """Column-oriented per-run metrics.
+    
+    Every metric gets one array('d') column with a value per run (NaN where a
+    run did not report the metric), so a run costs one flat row of doubles and
+    aggregating a metric is a single pass over its column.
+    """
+    
+    def __init__(self):
+        self.index = {}  # metric name -> column number
+        self.columns = []
+        self._float_metrics = set()  # metrics with non-integer values
+        self._rows = 0
+    
+    @classmethod
+    def from_rows(cls, rows):
+        table = cls()
+        table.extend(rows)
+        return table
+    
+    @classmethod
+    def from_columns(cls, columns):
+        """Build a table of float metrics from a dict of equally long array('d') columns."""
+        table = cls()
+        for metric, column in columns.items():
+            table.index[metric] = len(table.columns)
+            table.columns.append(column)
+            table._float_metrics.add(metric)
+            table._rows = len(column)
+        return table
+    
+    def __len__(self):
+        return self._rows
+    
+    def append(self, metrics):
+        for metric, value in metrics.items():
+            if metric not in self.index:
+                self.index[metric] = len(self.columns)
+                self.columns.append(array.array('d', [float("nan")]) * self._rows)
+            if not isinstance(value, int):
+                self._float_metrics.add(metric)
+        for metric, column in self.index.items():
+            self.columns[column].append(metrics.get(metric, float("nan")))
+        self._rows += 1
+    
+    def extend(self, rows):
+        for metrics in rows:
+            self.append(metrics)
+    
+    def metrics(self):
+        return list(self.index)
+    
+    def _convert(self, metric, value):
+        return float(value) if metric in self._float_metrics else int(value)
+    
+    def column(self, metric):
+        """Return the values of metric over all runs that reported it."""
+        if metric not in self.index:
+            return []
+        return [self._convert(metric, value) for value in self.columns[self.index[metric]] if value == value]
+    
+    def row(self, i):
+        return {metric: self._convert(metric, self.columns[column][i])
+                for metric, column in self.index.items() if self.columns[column][i] == self.columns[column][i]}
+    
+    def rows(self):
+        return [self.row(i) for i in range(self._rows)]
+    
+    def stats(self, metric):
+        """Aggregate one column into MetricStats, or None if no run reported it."""
+        if metric not in self.index:
+            return None
+        if np is not None:
+            values = np.frombuffer(self.columns[self.index[metric]], dtype=np.float64)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                return None
+            stdev = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+            return MetricStats(metric, len(values), float(values.mean()), stdev,
+                               self._convert(metric, values.min()), self._convert(metric, values.max()))
+        values = self.column(metric)
+        return MetricStats.from_values(metric, values) if values else None
+
+
+class StreamingTable:
+    """Constant-memory alternative to RunTable for long campaigns.
+    
+    Runs are folded into RunningStats per metric as they arrive; only a
+    bounded reservoir sample of each metric is kept.
+    """
+    
+    # Metrics with few distinct values that are tracked exactly
+    DISTINCT_METRICS = {'cpu'}
+    
+    def __init__(self, reservoir_size=1024):
+        self.index = {}  # metric name -> RunningStats
+        self.reservoir_size = reservoir_size
+        self._float_metrics = set()
+        self._distinct = {}
+        self._rows = 0
+    
+    def __len__(self):
+        return self._rows
+    
+    def append(self, metrics):
+        for metric, value in metrics.items():
+            if metric not in self.index:
+                self.index[metric] = RunningStats(self.reservoir_size)
+            self.index[metric].add(value)
+            if not isinstance(value, int):
+                self._float_metrics.add(metric)
+            if metric in self.DISTINCT_METRICS:
+                self._distinct.setdefault(metric, set()).add(value)
+        self._rows += 1
+    
+    def extend(self, rows):
+        for metrics in rows:
+            self.append(metrics)
+    
+    def metrics(self):
+        return list(self.index)
+    
+    def column(self, metric):
+        """Return the exact distinct values for tracked metrics, else the reservoir sample."""
+        if metric in self._distinct:
+            return sorted(self._distinct[metric])
+        return list(self.index[metric].reservoir) if metric in self.index else []
+    
+    def rows(self):
+        """Individual runs are not kept in streaming mode."""
+        return []
+    
+    def stats(self, metric):
+        running = self.index.get(metric)
+        if running is None or not running.count:
+            return None
+        return MetricStats(metric, running.count, running.mean, running.stdev, running.min, running.max)
+
+
+@dataclasses.dataclass
+class CompileResult:
+    """Outcome of compiling one variant."""
+    source: str
+    binary: str
+    opt_level: int
+    success: bool
+    cached: bool = False
+    stderr: str = ""
+    
+    def __bool__(self):
+        return self.success
+
+
+@dataclasses.dataclass
+class RunMetrics:
+    """Metrics of a single measured run, keyed like perf's event names."""
+    values: dict
+    cpu: int = None
+    
+    def __getitem__(self, metric):
+        return self.values[metric]
+    
+    def __contains__(self, metric):
+        return metric in self.values
+    
+    def get(self, metric, default=None):
+        return self.values.get(metric, default)
+
+
+@dataclasses.dataclass
+class MetricStats:
+    """Aggregated statistics of one metric over several runs."""
+    metric: str
+    count: int
+    mean: float
+    stdev: float
+    min: float
+    max: float
+    
+    @property
+    def stdev_pct(self):
+        return self.stdev / self.mean * 100 if self.mean != 0 else 0
+    
+    @classmethod
+    def from_values(cls, metric, values):
+        import statistics
+        
+        return cls(metric, len(values), statistics.mean(values),
+                   statistics.stdev(values) if len(values) > 1 else 0.0,
+                   min(values), max(values))
+
+
+class IntervalMetrics(dict):
+    """Metrics of a run measured in interval mode, carrying its time series."""
+    
+    def __init__(self, metrics, series):
+        super().__init__(metrics)
+        self.series = series  # RunTable with one row per interval
+
+
+@dataclasses.dataclass
+class PerfResult:
+    """All runs of one variant; falsy if no run succeeded."""
+    variant: str
+    duration: float
+    syscalls: bool = False
+    table: RunTable = dataclasses.field(default_factory=RunTable)
+    series: list = dataclasses.field(default_factory=list)  # interval mode: a RunTable per run
+    
+    def __bool__(self):
+        return len(self.table) > 0
+    
+    @property
+    def runs(self):
+        """RunMetrics for every run, built on demand from the column table."""
+        return [RunMetrics(values, values.get('cpu')) for values in self.table.rows()]
+    
+    def values(self, metric):
+        """Return the values of metric over all runs that reported it."""
+        return self.table.column(metric)
+    
+    def statistics(self):
+        """Return MetricStats for every metric, keyed by metric name."""
+        return {metric: self.table.stats(metric) for metric in self.table.metrics() if metric != 'cpu'}
+    
+    def percentiles(self, metric, qs=(50, 5, 95, 99)):
+        """Return the requested percentiles (0-100) of metric."""
+        return _percentiles(self.values(metric), qs)
+    
+    def bootstrap_ci(self, metric, iterations=10000, confidence=95):
+        """Return the bootstrap confidence interval (low, high) of the mean of metric."""
+        return _bootstrap_mean_ci(self.values(metric), iterations, confidence)
+
+
+@dataclasses.dataclass
+class AsmAnalysis:
+    """Static analysis of the wait function of a binary."""
+    binary_hash: str
+    instructions: list  # [address, mnemonic, operands] of every instruction
+    loops: list  # [start, end] address ranges closed by backward branches
+    inner_loop: list = None  # innermost loop range, None without loops
+    inner_loop_instructions: int = 0
+    calls: list = dataclasses.field(default_factory=list)  # called functions in order
+    clock_calls: int = 0
+    busy_loop: bool = False  # a loop without any calls, i.e. pure CPU burning
+    
+    def summary(self):
+        """Describe the hot loop in one line."""
+        if not self.inner_loop:
+            return f"No loop in {WAIT_FUNCTION} ({len(self.instructions)} instructions, {self.clock_calls} clock calls)"
+        busy = "present" if self.busy_loop else "optimized away or absent"
+        return (f"Innermost loop: {self.inner_loop_instructions} "
+                f"instruction{'s' if self.inner_loop_instructions != 1 else ''} per iteration, "
+                f"{self.clock_calls} clock call{'s' if self.clock_calls != 1 else ''}, busy loop {busy}")
+
+
+@dataclasses.dataclass
+class CostPrediction:
+    """Statically predicted cost of one iteration of the innermost loop."""
+    model: str  # "llvm-mca" or "simple"
+    instructions: int
+    cycles: float
+    calls: list = dataclasses.field(default_factory=list)  # calls in the loop, not modeled
+    
+    @property
+    def ipc(self):
+        return self.instructions / self.cycles if self.cycles else 0.0
+
+
+@dataclasses.dataclass
+class ProfileResult:
+    """Folded call stacks sampled from one run of a variant."""
+    variant: str
+    folded: dict  # "root;...;leaf" -> samples, leaf frames are annotated _[k] (kernel) or @dso (libraries)
+    svg_path: str = None
+    cached: bool = False
+    
+    @property
+    def samples(self):
+        return sum(self.folded.values())
+    
+    def top_symbols(self, limit=15):
+        """Return (frame, self samples, total samples) of the frames with the most self samples."""
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.folded.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+class ResultStore:
+    """SQLite database holding the metrics of every measured run."""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            variant TEXT NOT NULL,
+            binary_hash TEXT NOT NULL,
+            opt_level INTEGER,
+            duration REAL,
+            mode TEXT,
+            backend TEXT,
+            compiler TEXT,
+            cflags TEXT,
+            cpus TEXT,
+            host TEXT,
+            kernel TEXT,
+            cpu_model TEXT,
+            timestamp TEXT
+        );
+        CREATE INDEX IF NOT EXISTS sessions_variant ON sessions (variant, opt_level, duration, timestamp);
+        CREATE INDEX IF NOT EXISTS sessions_binary ON sessions (binary_hash, duration, mode);
+        CREATE INDEX IF NOT EXISTS sessions_host ON sessions (host, timestamp);
+        CREATE TABLE IF NOT EXISTS runs (
+            session_id INTEGER NOT NULL REFERENCES sessions (id),
+            run_index INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            value
+        );
+        CREATE INDEX IF NOT EXISTS runs_session ON runs (session_id, run_index);
+        CREATE TABLE IF NOT EXISTS series (
+            session_id INTEGER NOT NULL REFERENCES sessions (id),
+            run_index INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            data BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS series_session ON series (session_id, run_index);
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(self.SCHEMA)
+        # Databases created before the cflags and cpus columns existed
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(sessions)")}
+        for column in ("cflags", "cpus"):
+            if column not in columns:
+                with self.conn:
+                    self.conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} TEXT")
+    
+    def start_session(self, **info):
+        columns = ", ".join(info)
+        placeholders = ", ".join("?" for _ in info)
+        with self.conn:
+            cursor = self.conn.execute(f"INSERT INTO sessions ({columns}) VALUES ({placeholders})",
+                                       list(info.values()))
+        return cursor.lastrowid
+    
+    def add_run(self, session_id, run_index, metrics):
+        # Commit every run so a crash loses at most the run in progress
+        with self.conn:
+            self.conn.executemany("INSERT INTO runs (session_id, run_index, metric, value) VALUES (?, ?, ?, ?)",
+                                  [(session_id, run_index, metric, value) for metric, value in metrics.items()])
+    
+    def add_series(self, session_id, run_index, table):
+        # Each column is stored as packed doubles
+        with self.conn:
+            self.conn.executemany("INSERT INTO series (session_id, run_index, metric, data) VALUES (?, ?, ?, ?)",
+                                  [(session_id, run_index, metric, table.columns[column].tobytes())
+                                   for metric, column in table.index.items()])
+    
+    def series(self, session_id):
+        columns = {}
+        for row in self.conn.execute("SELECT run_index, metric, data FROM series WHERE session_id = ? "
+                                     "ORDER BY run_index", (session_id,)):
+            column = array.array('d')
+            column.frombytes(row["data"])
+            columns.setdefault(row["run_index"], {})[row["metric"]] = column
+        return [RunTable.from_columns(run_columns) for run_columns in columns.values()]
+    
+    def session(self, session_id):
+        row = self.conn.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def sessions(self, variant=None, limit=20):
+        query = ("SELECT s.*, (SELECT COUNT(DISTINCT run_index) FROM runs WHERE session_id = s.id) AS runs "
+                 "FROM sessions s")
+        params = []
+        if variant:
+            query += " WHERE variant = ?"
+            params.append(variant)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(query, params)]
+    
+    def matching_runs(self, info, limit=None):
+        """Return the newest runs whose session matches info in everything that affects the result."""
+        keys = ["binary_hash", "kernel", "cpu_model", "duration", "mode", "backend", "cpus"]
+        query = ("SELECT r.session_id, r.run_index, r.metric, r.value FROM runs r "
+                 "JOIN sessions s ON s.id = r.session_id WHERE "
+                 + " AND ".join(f"s.{key} = ?" for key in keys)
+                 + " ORDER BY r.session_id DESC, r.run_index")
+        runs = {}
+        for row in self.conn.execute(query, [info[key] for key in keys]):
+            run_key = (row["session_id"], row["run_index"])
+            if run_key not in runs:
+                if limit is not None and len(runs) == limit:
+                    break
+                runs[run_key] = {}
+            runs[run_key][row["metric"]] = row["value"]
+        return list(runs.values())
+    
+    def runs(self, session_id):
+        runs = {}
+        for row in self.conn.execute("SELECT run_index, metric, value FROM runs WHERE session_id = ? "
+                                     "ORDER BY run_index", (session_id,)):
+            runs.setdefault(row["run_index"], {})[row["metric"]] = row["value"]
+        return list(runs.values())
+
+
+class LiveSummary:
+    """Redraws a block of text in place on a terminal."""
+    
+    def __init__(self):
+        self.lines = 0
+    
+    def update(self, text):
+        self.clear()
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        self.lines = text.count('\n')
+    
+    def clear(self):
+        if self.lines:
+            # Move the cursor to the start of the block and erase everything below
+            sys.stdout.write(f"\033[{self.lines}F\033[J")
+            sys.stdout.flush()
+        self.lines = 0
+
+
 class WasteCpuManager:
     def __init__(self):
         self.cc = "gcc"
@@ -17,29 +604,153 @@ class WasteCpuManager:
         self.perf_duration = 10
         self.opt_level = 3  # Default to -O3
         self.working_dir = os.getcwd()
+        self.cache_dir = os.path.join(self.working_dir, ".waste-cpu-cache")
+        self.build_cache = True
+        self.build_cache_entries = 64  # LRU limit for cached binaries
+        self._compiler_ids = {}
+        self.quiet = False  # suppress all console output when used as a library
+        self.backend = "perf"  # or "direct" for perf_event_open via ctypes
+        self.cpus = None  # CPUs to pin runs to, None for no pinning
+        self.avoid_smt = False
+        self.reserved_cpus = 1  # housekeeping CPUs kept free of concurrent runs
+        self.ci_metrics = None  # metrics checked in adaptive mode, None for mode defaults
+        self.min_runs = 3
+        self.compare_looks = 5  # planned interim analyses for the early stop of compare
+        self.max_time = None  # wall-clock budget in seconds for adaptive mode
+        self.results_db = os.path.join(self.working_dir, "waste-cpu-results.db")
+        self.store_results = True
+        self.reuse_results = False  # reuse stored runs of identical measurements
+        self._store = None
+        self.show_distribution = False  # percentiles and bootstrap CIs below the results table
+        self.bootstrap_iterations = 10000
+        self.show_prediction = False  # static loop cost prediction next to the measured IPC
+        self.with_syscalls = False  # count syscalls in the same runs as the counters
+        self.wait_phase = False  # count only while my_wait runs, not during startup and exit
+        self.interval_ms = None  # sample the counters every this many milliseconds during each run
+        self.prune_syscalls = True  # trace only the syscalls a discovery run of the variant made
+        self._syscall_sets = {}  # binary hash -> discovered syscall names
 
+    def _log(self, *args, **kwargs):
+        """Print progress output unless the manager is used quietly as a library."""
+        if not self.quiet:
+            print(*args, **kwargs)
+    
     def compile(self, filename, extra_args=None):
-        """Compile a .c file into an executable."""
+        """Compile a .c file into an executable and return a CompileResult."""
         if not filename.endswith(".c"):
             filename = f"{filename}.c"
             
         basename = os.path.splitext(filename)[0]
         opt_flag = f"-O{self.opt_level}"
         
-        cmd = [self.cc, opt_flag] + self.cflags + ["-o", basename, filename]
-        if extra_args:
-            cmd.extend(extra_args)
+        key = self._build_key(filename, extra_args) if self.build_cache else None
+        cached = self._cached_build(key)
+        if cached:
+            shutil.copy2(cached, basename)
+            self._log(f"Using cached build of {filename} with {opt_flag}")
+            return CompileResult(filename, basename, self.opt_level, True, cached=True)
             
-        print(f"Compiling {filename} with {opt_flag}...")
-        result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+        self._log(f"Compiling {filename} with {opt_flag}...")
+        try:
+            result = self._run_compiler(filename, basename, extra_args)
+        except FileNotFoundError:
+            self._log(f"Error: Compiler {self.cc} not found")
+            return CompileResult(filename, basename, self.opt_level, False, stderr=f"{self.cc} not found")
         
         if result.returncode == 0:
-            print(f"Successfully compiled {basename}")
-            return True
+            self._log(f"Successfully compiled {basename}")
+            if key is not None:
+                self._store_build(basename, key)
+            return CompileResult(filename, basename, self.opt_level, True, stderr=result.stderr)
         else:
-            print(f"Error compiling {basename}:")
-            print(result.stderr)
-            return False
+            self._log(f"Error compiling {basename}:")
+            self._log(result.stderr)
+            return CompileResult(filename, basename, self.opt_level, False, stderr=result.stderr)
+    
+    def build_all(self, c_files, opt_levels=None, extra_args=None, cc=None, output_pattern=None):
+        """Compile all files at all requested optimization levels in parallel.
+        
+        The binaries end up in the build cache (unless it is disabled), so later
+        compile() calls are cache hits. cc overrides the configured compiler.
+        output_pattern, a format string with {basename} and {level} fields,
+        places each binary at its own path, which cache eviction cannot take away.
+        Returns the set of (filename, opt_level) pairs that failed.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        
+        opt_levels = opt_levels or [self.opt_level]
+        cc_path = self._compiler_id(cc)[0]
+        jobs = [(filename, level) for filename in c_files for level in opt_levels]
+        workers = min(len(jobs), os.cpu_count() or 1)
+        self._log(f"Building {len(jobs)} binar{'ies' if len(jobs) > 1 else 'y'} with {workers} parallel job{'s' if workers > 1 else ''}...")
+        
+        # Workers only get plain values, the manager itself may hold unpicklable state
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for filename, level in jobs:
+                output = None
+                if output_pattern:
+                    output = output_pattern.format(basename=os.path.splitext(filename)[0], level=level)
+                futures.append(pool.submit(
+                    _build_worker, filename, self._build_key(filename, extra_args, level, cc), cc_path,
+                    level, self.cflags, extra_args, self.cache_dir, self.build_cache_entries,
+                    self.build_cache, output))
+            outcomes = [future.result() for future in futures]
+        
+        failed = set()
+        for (filename, level), (success, stderr) in zip(jobs, outcomes):
+            if not success:
+                failed.add((filename, level))
+                self._log(f"Error compiling {filename} with -O{level}:")
+                self._log(stderr)
+        
+        built = len(jobs) - len(failed)
+        self._log(f"Build phase finished: {built}/{len(jobs)} binaries ready")
+        return failed
+    
+    def _run_compiler(self, filename, output, extra_args=None):
+        """Invoke the compiler for filename and return the completed process."""
+        return _run_compiler(self.cc, self.opt_level, self.cflags, filename, output, extra_args)
+    
+    def _cached_build(self, key):
+        """Return the cached binary for key, or None if it was never built."""
+        return _cached_build(self.cache_dir, key)
+    
+    def _compiler_id(self, cc=None):
+        """Return the resolved path and version line of a compiler (default: the configured one)."""
+        cc = cc or self.cc
+        if cc not in self._compiler_ids:
+            path = shutil.which(cc) or cc
+            try:
+                result = subprocess.run([path, "--version"], capture_output=True, text=True)
+                version = result.stdout.split('\n')[0].strip()
+            except FileNotFoundError:
+                version = ""
+            self._compiler_ids[cc] = (path, version)
+        return self._compiler_ids[cc]
+    
+    def _build_key(self, filename, extra_args=None, opt_level=None, cc=None):
+        """Hash everything that influences the binary built from filename."""
+        digest = hashlib.sha256()
+        try:
+            for path in (filename, "main.h"):
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+                digest.update(b"\0")
+        except FileNotFoundError:
+            # Let the compiler report the missing file
+            return None
+        
+        path, version = self._compiler_id(cc)
+        opt_level = self.opt_level if opt_level is None else opt_level
+        for part in [path, version, f"-O{opt_level}"] + self.cflags + list(extra_args or []):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def _store_build(self, binary, key):
+        """Copy a freshly built binary into the build cache and evict old entries."""
+        _store_build(self.cache_dir, self.build_cache_entries, binary, key)
     
     def show_code(self, filename, include_main=False):
         """Display the full source code for a file and main.h."""
@@ -74,13 +785,13 @@ class WasteCpuManager:
                     if not line.strip().startswith('#include "main.h"'):
                         print(line)
             
-            # Optionally show main function
+            # Optionally show main function, with the helpers it calls (perf_control)
             if include_main:
                 print()
                 main_lines = main_content.split('\n')
                 in_main = False
                 for line in main_lines:
-                    if 'int main(' in line:
+                    if not in_main and line.strip() and not line.startswith(('#include', 'void my_wait(')):
                         in_main = True
                     if in_main:
                         print(line)
@@ -93,8 +804,214 @@ class WasteCpuManager:
     
 
     
-    def perf(self, filename, duration=None, runs=1, syscalls=False, quiet_runs=False):
-        """Run performance analysis using perf stat."""
+    def show_asm(self, filenames=None):
+        """Disassemble the wait function of one variant, or summarize the hot loops of several."""
+        c_files = [f if f.endswith(".c") else f"{f}.c" for f in filenames] if filenames else self._variant_files()
+        analyses = {}
+        for filename in c_files:
+            result = self.compile(filename)
+            if not result:
+                continue
+            try:
+                analyses[result.binary] = self.analyze_asm(result.binary)
+            except (OSError, subprocess.CalledProcessError, ValueError) as e:
+                self._log(f"Error disassembling {result.binary}: {e}")
+        if not analyses:
+            return analyses
+        
+        if len(c_files) == 1:
+            (basename, analysis), = analyses.items()
+            loop = analysis.inner_loop or [None, None]
+            print(f"\n{WAIT_FUNCTION} in {basename} (-O{self.opt_level}), innermost loop marked with '|':")
+            print("-" * 60)
+            for address, mnemonic, operands in analysis.instructions:
+                marker = "|" if loop[0] is not None and loop[0] <= address <= loop[1] else " "
+                print(f"{marker} {address:>8x}:  {mnemonic:<7} {operands}".rstrip())
+            print("-" * 60)
+            print(analysis.summary())
+            if analysis.calls:
+                print(f"Calls: {', '.join(analysis.calls)}")
+            return analyses
+        
+        print(f"\n{'Variant':<16} {'Insns':>6} {'Loops':>6} {'Loop Insns':>11} {'Clock Calls':>12} {'Busy Loop':>10}")
+        print("-" * 66)
+        for basename, analysis in analyses.items():
+            loop_insns = analysis.inner_loop_instructions if analysis.inner_loop else "-"
+            print(f"{basename:<16} {len(analysis.instructions):>6} {len(analysis.loops):>6} {loop_insns:>11} "
+                  f"{analysis.clock_calls:>12} {'yes' if analysis.busy_loop else 'no':>10}")
+        return analyses
+    
+    def analyze_asm(self, binary):
+        """Disassemble the wait function of binary and find its loops, cached by binary hash."""
+        import json
+        
+        binary_hash = _file_hash(binary)
+        cache_path = os.path.join(self.cache_dir, "asm", f"{binary_hash}.json")
+        try:
+            with open(cache_path) as f:
+                return AsmAnalysis(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            pass
+        
+        result = subprocess.run(["objdump", "-d", "--no-show-raw-insn", f"--disassemble={WAIT_FUNCTION}", binary],
+                                capture_output=True, text=True, check=True)
+        analysis = _analyze_disassembly(result.stdout, binary_hash)
+        
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dataclasses.asdict(analysis), f)
+        os.replace(tmp_path, cache_path)
+        return analysis
+    
+    def predict_cost(self, binary):
+        """Predict cycles per iteration of the innermost loop, via llvm-mca if available."""
+        analysis = self.analyze_asm(binary)
+        if not analysis.inner_loop:
+            return None
+        start, end = analysis.inner_loop
+        body = [(mnemonic, operands) for address, mnemonic, operands in analysis.instructions
+                if start <= address <= end]
+        calls = [re.sub(r"@.*", "", target.group(1)) for mnemonic, operands in body
+                 for target in [re.search(r"<([^>+]+)", operands)] if mnemonic in CALL_MNEMONICS and target]
+        # Both models and the instruction count see the same list: the loop without its calls,
+        # branches pointing at a label since llvm-mca cannot resolve objdump's targets
+        modeled = [(mnemonic, re.sub(r"[0-9a-f]+ <[^>]*>", ".Lloop", operands)) for mnemonic, operands in body
+                   if mnemonic not in CALL_MNEMONICS]
+        if not modeled:
+            return None
+        
+        cycles = _llvm_mca_cycles(modeled) if shutil.which("llvm-mca") else None
+        if cycles is not None:
+            return CostPrediction("llvm-mca", len(modeled), cycles, calls)
+        return CostPrediction("simple", len(modeled), _simple_loop_cycles(modeled), calls)
+    
+    def _display_prediction(self, results, basename):
+        """Display predicted against measured IPC and instructions of a variant."""
+        try:
+            prediction = self.predict_cost(basename)
+        except (OSError, subprocess.CalledProcessError, ValueError) as e:
+            print(f"No static prediction for {basename}: {e}")
+            return
+        if prediction is None:
+            print(f"No static prediction for {basename}: {WAIT_FUNCTION} contains no loop")
+            return
+        
+        print(f"Static prediction ({prediction.model}) for the innermost loop of {basename}: "
+              f"{prediction.instructions} instructions in {prediction.cycles:.2f} cycles per iteration")
+        ipc = results.stats('insn_per_cycle')
+        cycles = results.stats('cycles')
+        instructions = results.stats('instructions')
+        print(f"{'Metric':<16} {'Predicted':>15} {'Measured':>15} {'Deviation':>10}")
+        print("-" * 59)
+        if ipc:
+            deviation = (ipc.mean - prediction.ipc) / prediction.ipc * 100 if prediction.ipc else 0
+            print(f"{'Insn/Cycle':<16} {prediction.ipc:>15.3f} {ipc.mean:>15.3f} {deviation:>+9.1f}%")
+        if cycles and instructions:
+            # Instructions the measured cycles would retire if all time was spent in the loop
+            predicted = prediction.ipc * cycles.mean
+            deviation = (instructions.mean - predicted) / predicted * 100 if predicted else 0
+            print(f"{'Instructions':<16} {predicted:>15,.0f} {instructions.mean:>15,.0f} {deviation:>+9.1f}%")
+        if prediction.calls:
+            print(f"The loop calls {', '.join(prediction.calls)}, whose cost is not modeled")
+        print()
+    
+    def profile(self, filename, duration=None, frequency=999, output=None):
+        """Sample the call stacks of one run with perf record and write a flame graph SVG.
+        
+        The folded stacks are cached per binary hash, duration and sampling
+        frequency. Returns a ProfileResult, or None if profiling failed.
+        """
+        basename = os.path.splitext(filename)[0]
+        if not self.compile(f"{basename}.c"):
+            return None
+        duration = duration or self.perf_duration
+        
+        cache_path = os.path.join(self.cache_dir, "profiles", f"{_file_hash(basename)}-{duration:g}s-{frequency}hz.folded")
+        folded = _read_folded(cache_path)
+        cached = folded is not None
+        if cached:
+            self._log(f"Using cached profile of {basename}")
+        else:
+            self._log(f"Profiling {basename} for {duration:g} seconds at {frequency} Hz...")
+            try:
+                folded = self._record_profile(basename, duration, frequency)
+            except FileNotFoundError:
+                self._log("Error: 'perf' command not found. Please install the perf utility.")
+                return None
+            except subprocess.CalledProcessError as e:
+                self._log(f"Error running perf: {e}")
+                if e.stderr:
+                    self._log(e.stderr.strip())
+                return None
+            if not folded:
+                self._log("Error: perf recorded no samples")
+                return None
+            _write_folded(cache_path, folded)
+        
+        result = ProfileResult(basename, folded, output or f"{basename}-flamegraph.svg", cached)
+        with open(result.svg_path, "w") as f:
+            f.write(_flame_graph_svg(folded, f"{basename} (-O{self.opt_level}, {duration:g} s, {result.samples:,} samples)"))
+        self._log(f"Wrote flame graph to {result.svg_path}")
+        if not self.quiet:
+            self._display_top_symbols(result)
+        return result
+    
+    def _record_profile(self, basename, duration, frequency):
+        """Run perf record on the binary and fold the stacks of perf script while it streams."""
+        import tempfile
+        
+        env = dict(os.environ, LC_ALL="C")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data = os.path.join(tmp_dir, "perf.data")
+            subprocess.run(["perf", "record", "-F", str(frequency), "-g", "-o", data,
+                            "--", f"./{basename}", f"{duration:g}"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env, check=True)
+            cmd = ["perf", "script", "-i", data]
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+            try:
+                folded = _fold_perf_script(proc.stdout, os.path.basename(basename))
+            finally:
+                proc.stdout.close()
+                stderr = proc.stderr.read()
+                proc.stderr.close()
+                proc.wait()
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+        return folded
+    
+    def _display_top_symbols(self, result, limit=15):
+        """Display the frames with the most self samples of a profile."""
+        samples = result.samples
+        print(f"\n Top symbols of {result.variant} ({samples:,} samples):")
+        print("=" * 80)
+        print(f"{'Symbol':<40} {'Where':<14} {'Self %':>10} {'Total %':>10}")
+        print("-" * 80)
+        for frame, own, total in result.top_symbols(limit):
+            symbol, where = _frame_location(frame)
+            print(f"{symbol[:40]:<40} {where[:14]:<14} {own / samples * 100:>9.2f}% {total / samples * 100:>9.2f}%")
+        print()
+    
+    def _asm_note(self, binary):
+        """Return the hot loop summary of binary for result tables, or None if it cannot be analyzed."""
+        try:
+            return self.analyze_asm(binary).summary()
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return None
+    
+    def perf(self, filename, duration=None, runs=1, syscalls=False, quiet_runs=False, perf_repeat=False,
+             target_ci=None, stream=False, build=True):
+        """Run performance analysis using perf stat.
+        
+        Returns a PerfResult with all runs, or None if nothing could be measured.
+        build=False measures the binary a build phase already put in place.
+        
+        With target_ci, runs is an upper bound: measuring stops as soon as the
+        relative 95% confidence interval of the selected metrics is within
+        ±target_ci percent of their mean (or the time budget is used up).
+        """
+        import time
+        
         if not filename.endswith(".c"):
             basename = filename
             filename = f"{filename}.c"
@@ -102,173 +1019,1216 @@ class WasteCpuManager:
             basename = os.path.splitext(filename)[0]
             
         # Always rebuild the program before perf testing
-        if not self.compile(filename):
-            return False
+        if build and not self.compile(filename):
+            return None
                 
         # Use provided duration or default
         duration = duration or self.perf_duration
         
-        mode_desc = "syscalls" if syscalls else "performance counters"
-        print(f"Running {basename} {runs} time{'s' if runs > 1 else ''} for {duration} seconds each (measuring {mode_desc})...")
+        mode_desc = self._mode_desc(syscalls)
+        up_to = "up to " if target_ci is not None else ""
+        self._log(f"Running {basename} {up_to}{runs} time{'s' if runs > 1 else ''} for {duration:g} seconds each (measuring {mode_desc})...")
+        
+        if self.backend == "direct":
+            if syscalls or self.with_syscalls:
+                self._log("Error: Syscall measurement requires the perf backend")
+                return None
+            if self.wait_phase:
+                self._log("Error: Wait phase measurement requires the perf backend")
+                return None
+            if self.interval_ms:
+                self._log("Error: Interval mode requires the perf backend")
+                return None
+            if perf_repeat:
+                self._log("Note: --perf-repeat only applies to the perf backend, running each run separately")
+                perf_repeat = False
+        if perf_repeat and self.interval_ms:
+            self._log("Note: --perf-repeat cannot be combined with interval mode, running each run separately")
+            perf_repeat = False
         
         # Check if syscalls mode requires root privileges
-        if syscalls and os.getuid() != 0:
-            print("Warning: Syscalls measurement may require root privileges. If it fails, try running with sudo.")
+        if (syscalls or self.with_syscalls) and os.getuid() != 0:
+            self._log("Warning: Syscalls measurement may require root privileges. If it fails, try running with sudo.")
         
-        results = []
-        if quiet_runs:
-            print("Runs: ", end="", flush=True)
-            
-        for run in range(runs):
-            if runs > 1:
-                if quiet_runs:
-                    print(".", end="", flush=True)
-                else:
-                    print(f"  Run {run + 1}/{runs}...", end=" ", flush=True)
-            
-            cmd = ["perf", "stat"]
-            
-            if syscalls:
-                # Count both total syscalls and individual syscalls
-                cmd.extend(["-e", "raw_syscalls:sys_enter,syscalls:sys_enter_*"])
-            else:
-                cmd.append("--")
-                
-            cmd.extend([f"./{basename}", str(duration)])
+        try:
+            run_cpus = self._run_cpus()
+        except ValueError as e:
+            self._log(f"Error: {e}")
+            return None
+        
+        ci_stats = None
+        if target_ci is not None:
+            ci_metrics = self.ci_metrics or (["total_syscalls", "time_elapsed"] if syscalls
+                                             else ["cycles", "time_elapsed"])
+            ci_stats = {metric: RunningStats() for metric in ci_metrics}
+            self._log(f"Adaptive mode: stopping once the 95% CI of {', '.join(ci_metrics)} is within "
+                      f"±{target_ci}% of the mean (at most {runs} runs)")
+        started = time.monotonic()
+        stop_reason = None
+        store_run = self._run_recorder(basename, duration, syscalls)
+        interval_series = []
+        
+        def record(parsed):
+            store_run(parsed)
+            if isinstance(parsed, IntervalMetrics):
+                interval_series.append(parsed.series)
+        
+        results = StreamingTable() if stream else RunTable()
+        live = LiveSummary() if stream and not self.quiet and sys.stdout.isatty() else None
+        # The live table replaces the per-run progress output
+        dots = quiet_runs and live is None
+        verbose = not quiet_runs and live is None
+        if self.reuse_results:
+            cached = self._stored_runs(basename, duration, syscalls, runs)
+            for parsed in cached:
+                results.append(parsed)
+                if ci_stats is not None:
+                    stop_reason = self._adaptive_stop(ci_stats, parsed, target_ci, started)
+                    if stop_reason:
+                        break
+            if results:
+                missing = 0 if stop_reason else runs - len(results)
+                self._log(f"Reusing {len(results)} stored run{'s' if len(results) > 1 else ''}, "
+                          f"measuring {missing} more")
+        remaining = 0 if stop_reason else runs - len(results)
+        
+        if dots and remaining:
+            self._log("Runs: ", end="", flush=True)
             
+        if perf_repeat and remaining > 1:
+            # One perf process repeats the workload itself and prints counters after every run
             try:
-                result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-                if not quiet_runs:
-                    print("done")
-                
-                # Parse the stderr output (perf writes to stderr)
-                parsed = self._parse_perf_output(result.stderr, syscalls, duration)
-                if parsed:
-                    results.append(parsed)
-                else:
-                    print("Warning: Failed to parse perf output for this run")
-                    
+                cpu = run_cpus[0] if run_cpus else None
+                done = len(results)
+                for run, parsed in enumerate(self._perf_repeat_runs(basename, duration, remaining, syscalls, cpu),
+                                             start=done):
+                    if dots:
+                        self._log(".", end="", flush=True)
+                    elif verbose:
+                        self._log(f"  Run {run + 1}/{runs}... done")
+                    if parsed:
+                        results.append(parsed)
+                        record(parsed)
+                        if live:
+                            live.update(self._render_perf_results(results, basename, duration, runs, syscalls))
+                        if ci_stats is not None:
+                            stop_reason = self._adaptive_stop(ci_stats, parsed, target_ci, started)
+                            if stop_reason:
+                                break
+                    else:
+                        self._log("Warning: Failed to parse perf output for this run")
             except subprocess.CalledProcessError as e:
-                print(f"\nError running perf: {e}")
-                if runs == 1:
-                    return False
+                self._log(f"\nError running perf: {e}")
             except FileNotFoundError:
-                print("Error: 'perf' command not found. Please install the perf utility.")
-                return False
+                self._log("Error: 'perf' command not found. Please install the perf utility.")
+                return None
+        elif remaining:
+            for run in range(runs - remaining, runs):
+                if runs > 1:
+                    if dots:
+                        self._log(".", end="", flush=True)
+                    elif verbose:
+                        self._log(f"  Run {run + 1}/{runs}...", end=" ", flush=True)
+            
+                try:
+                    cpu = run_cpus[run % len(run_cpus)] if run_cpus else None
+                    parsed = self._measure_run(basename, duration, syscalls, cpu)
+                    if verbose:
+                        self._log("done")
+                    
+                    if parsed:
+                        results.append(parsed)
+                        record(parsed)
+                        if live:
+                            live.update(self._render_perf_results(results, basename, duration, runs, syscalls))
+                        if ci_stats is not None:
+                            stop_reason = self._adaptive_stop(ci_stats, parsed, target_ci, started)
+                            if stop_reason:
+                                break
+                    else:
+                        self._log("Warning: Failed to parse perf output for this run")
+                    
+                except subprocess.CalledProcessError as e:
+                    self._log(f"\nError running perf: {e}")
+                    if runs == 1:
+                        return None
+                except FileNotFoundError:
+                    self._log("Error: 'perf' command not found. Please install the perf utility or use --backend direct.")
+                    return None
+                except OSError as e:
+                    self._log(f"\nError opening performance counters: {e}")
+                    return None
+        
+        if live:
+            live.clear()
+        if dots and remaining:
+            self._log()  # Add newline after dots
         
-        if quiet_runs:
-            print()  # Add newline after dots
+        if ci_stats is not None and results:
+            runs = len(results)
+            widths = ", ".join(f"±{stats.relative_ci():.2f}% ({metric})"
+                               for metric, stats in ci_stats.items() if stats.count > 1)
+            self._log(f"Stopped after {runs} run{'s' if runs > 1 else ''} "
+                      f"({stop_reason or 'run limit reached'}): 95% CI {widths or 'not available'}")
         
         if results:
-            self._display_perf_results(results, basename, duration, runs, syscalls)
-            return True
+            if not self.quiet:
+                self._display_perf_results(results, basename, duration, runs, syscalls)
+                if self.show_prediction and not syscalls:
+                    self._display_prediction(results, basename)
+                if interval_series:
+                    self._display_intervals(interval_series, basename, duration)
+            return self._perf_result(basename, duration, syscalls, results, interval_series)
         else:
-            print("No successful perf runs completed")
-            return False
+            self._log("No successful perf runs completed")
+            return None
+    
+    def _render_perf_results(self, results, basename, duration, runs, syscalls=False):
+        """Render the live summary table of the runs measured so far."""
+        import io
+        
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            print(f"Live summary after {len(results)}/{runs} runs of {basename}:")
+            self._display_perf_results(results, basename, duration, len(results), syscalls)
+        return buffer.getvalue()
+    
+    def _perf_result(self, basename, duration, syscalls, results, series=None):
+        """Wrap the run table (and interval series) of a variant into a PerfResult."""
+        return PerfResult(basename, duration, syscalls, results, list(series or []))
+    
+    def compare(self, filenames, duration=None, runs=10, syscalls=False, alpha=0.05, metric=None):
+        """Measure variants with interleaved, randomized runs and test their differences.
+        
+        The first variant is the baseline. Every round measures each variant
+        once in a shuffled order so that thermal and frequency drift affect all
+        variants alike. The primary metric is tested at compare_looks planned
+        rounds against a Pocock boundary, so repeated testing keeps the overall
+        alpha, and measuring stops early once every variant differs
+        significantly from the baseline (Welch's t-test and Mann-Whitney U
+        below the adjusted alpha). Returns a dict of PerfResults by variant.
+        """
+        if len(filenames) < 2:
+            self._log("Error: compare needs at least two variants")
+            return {}
+        duration = duration or self.perf_duration
+        metric = metric or ("total_syscalls" if syscalls else "cycles")
+        
+        basenames = []
+        for filename in filenames:
+            basename = os.path.splitext(filename)[0]
+            if not self.compile(f"{basename}.c"):
+                return {}
+            basenames.append(basename)
+        
+        try:
+            run_cpus = self._run_cpus()
+        except ValueError as e:
+            self._log(f"Error: {e}")
+            return {}
+        
+        looks = _planned_looks(runs, max(self.min_runs, 2), self.compare_looks)
+        look_alpha = _pocock_alpha(looks, alpha)
+        self._log(f"Comparing {', '.join(basenames)} against {basenames[0]} with up to {runs} interleaved "
+                  f"rounds of {duration:g} seconds (primary metric: {metric}, alpha={alpha})...")
+        if len(looks) > 1:
+            self._log(f"Testing after rounds {', '.join(map(str, looks))} with a Pocock boundary "
+                      f"(adjusted alpha={look_alpha:.4g} per look)")
+        self._log("Rounds: ", end="", flush=True)
+        
+        tables = {basename: RunTable() for basename in basenames}
+        recorders = {basename: self._run_recorder(basename, duration, syscalls) for basename in basenames}
+        shuffler = random.Random()
+        run_index = 0
+        stop_reason = None
+        for round_number in range(1, runs + 1):
+            order = list(basenames)
+            shuffler.shuffle(order)
+            for basename in order:
+                cpu = run_cpus[run_index % len(run_cpus)] if run_cpus else None
+                run_index += 1
+                try:
+                    parsed = self._measure_run(basename, duration, syscalls, cpu)
+                except subprocess.CalledProcessError as e:
+                    self._log(f"\nError running perf: {e}")
+                    continue
+                except FileNotFoundError:
+                    self._log("\nError: 'perf' command not found. Please install the perf utility or use --backend direct.")
+                    return {}
+                except OSError as e:
+                    self._log(f"\nError opening performance counters: {e}")
+                    return {}
+                if parsed:
+                    tables[basename].append(parsed)
+                    recorders[basename](parsed)
+            self._log(".", end="", flush=True)
+            
+            # Only at the planned looks, testing after every round would inflate the false positive rate
+            if round_number in looks and min(len(table) for table in tables.values()) >= 2:
+                baseline = tables[basenames[0]].column(metric)
+                if baseline and all(
+                        max(_welch_t_test(baseline, tables[b].column(metric))[2],
+                            _mann_whitney_u(baseline, tables[b].column(metric))[1]) < look_alpha
+                        for b in basenames[1:] if tables[b].column(metric)):
+                    stop_reason = "all differences significant"
+                    break
+        self._log()
+        
+        rounds = min(len(table) for table in tables.values())
+        self._log(f"Stopped after {rounds} round{'s' if rounds != 1 else ''} ({stop_reason or 'run limit reached'})")
+        if not self.quiet:
+            for basename in basenames[1:]:
+                self._display_comparison(tables[basenames[0]], tables[basename], basenames[0], basename,
+                                         syscalls, alpha, look_alpha, len(looks))
+        return {basename: self._perf_result(basename, duration, syscalls, table)
+                for basename, table in tables.items() if table}
+    
+    def _display_comparison(self, baseline, variant, baseline_name, variant_name, syscalls, alpha,
+                            look_alpha=None, looks=1):
+        """Display per-metric deltas, p-values and effect sizes of variant against baseline.
+        
+        look_alpha is the per-look significance level adjusted for the looks of
+        a sequential campaign, defaulting to alpha for a single fixed-size test.
+        """
+        look_alpha = alpha if look_alpha is None else look_alpha
+        print(f"\n Comparison {variant_name} vs. {baseline_name} ({len(variant)} vs. {len(baseline)} runs):")
+        print("=" * 84)
+        print(f"{'Metric':<16} {'Baseline':>14} {'Variant':>14} {'Delta %':>9} {'Welch p':>9} {'M-W p':>9} {'Hedges g':>8}")
+        print("-" * 84)
+        
+        merged = RunTable.from_rows(baseline.rows() + variant.rows())
+        metrics_info = self._metrics_info(merged, syscalls)
+        if not syscalls:
+            metrics_info += self._syscall_metrics_info(merged)
+        for metric_key, metric_name in metrics_info:
+            a = baseline.column(metric_key)
+            b = variant.column(metric_key)
+            if len(a) < 2 or len(b) < 2:
+                continue
+            mean_a = math.fsum(a) / len(a)
+            mean_b = math.fsum(b) / len(b)
+            delta_pct = (mean_b - mean_a) / abs(mean_a) * 100 if mean_a != 0 else float("nan")
+            welch_p = _welch_t_test(a, b)[2]
+            mw_p = _mann_whitney_u(a, b)[1]
+            marker = " *" if max(welch_p, mw_p) < look_alpha else ""
+            
+            if metric_key.endswith('_time') or metric_key == 'time_elapsed':
+                means = f"{mean_a:>14.6f} {mean_b:>14.6f}"
+            elif metric_key.endswith('_pct') or metric_key in RATIO_METRICS:
+                means = f"{mean_a:>14.3f} {mean_b:>14.3f}"
+            else:
+                means = f"{mean_a:>14,.0f} {mean_b:>14,.0f}"
+            print(f"{metric_name:<16} {means} {delta_pct:>+8.2f}% {welch_p:>9.4f} {mw_p:>9.4f} "
+                  f"{_hedges_g(a, b):>8.2f}{marker}")
+        if looks > 1:
+            print(f"* significant in both tests at the adjusted alpha={look_alpha:.4g} "
+                  f"(overall alpha={alpha} over {looks} looks)")
+        else:
+            print(f"* significant at alpha={alpha} in both tests")
+        print()
+    
+    def _adaptive_stop(self, ci_stats, parsed, target_ci, started):
+        """Update the confidence intervals with a new run; return why to stop, or None."""
+        import time
+        
+        for metric, stats in ci_stats.items():
+            if metric in parsed:
+                stats.add(parsed[metric])
+        
+        if self.max_time is not None and time.monotonic() - started >= self.max_time:
+            return "time budget used up"
+        
+        # Metrics that the backend never reports cannot hold back the decision
+        measured = [stats for stats in ci_stats.values() if stats.count > 0]
+        if not measured or min(stats.count for stats in measured) < max(self.min_runs, 2):
+            return None
+        if all(stats.relative_ci() <= target_ci for stats in measured):
+            return "target confidence reached"
+        return None
     
-    def perf_all(self, duration=None, runs=1, syscalls=False):
-        """Run performance analysis on all C files in the current directory."""
+    def perf_all(self, duration=None, runs=1, syscalls=False, perf_repeat=False, jobs=1,
+                 target_ci=None, stream=False):
+        """Run performance analysis on all C files in the current directory.
+        
+        Returns a dict mapping each successfully measured variant to its PerfResult.
+        """
+        c_files = self._variant_files()
+        if not c_files:
+            return {}
+        
+        self._log(f"Running performance tests on {len(c_files)} files: {', '.join(c_files)}")
+        self._log()
+        
+        # Build everything up front, straight to the final binaries, so the
+        # measurement phase never waits on the compiler (also without the cache)
+        failed_builds = self.build_all(c_files, output_pattern="{basename}")
+        self._log()
+        
+        if jobs > 1:
+            if target_ci is not None:
+                self._log("Note: adaptive run counts are not supported with concurrent runs, using the maximum run count")
+            c_files = [f for f in c_files if (f, self.opt_level) not in failed_builds]
+            return self._perf_all_concurrent(c_files, duration, runs, syscalls, jobs)
+        
+        perf_results = {}
+        for filename in c_files:
+            self._log(f"{'='*60}")
+            self._log(f"Testing {filename}")
+            self._log(f"{'='*60}")
+            
+            if (filename, self.opt_level) in failed_builds:
+                self._log(f"Skipping {filename}, it failed to compile")
+                continue
+            
+            result = self.perf(filename, duration, runs, syscalls, quiet_runs=True, perf_repeat=perf_repeat,
+                               target_ci=target_ci, stream=stream, build=False)
+            if result:
+                perf_results[result.variant] = result
+                note = self._asm_note(result.variant)
+                if note:
+                    self._log(note)
+                    self._log()
+            else:
+                self._log(f"Failed to run perf test for {filename}")
+        
+        self._log(f"\nCompleted perf tests: {len(perf_results)}/{len(c_files)} successful")
+        return perf_results
+    
+    def _variant_files(self):
+        """Return the sorted implementation .c files in the current directory."""
         import glob
         
         # Find all .c files in the current directory
         c_files = glob.glob("*.c")
         if not c_files:
-            print("No .c files found in the current directory")
-            return False
+            self._log("No .c files found in the current directory")
+            return []
         
         # Filter out main.h if it exists as a .c file
         c_files = [f for f in c_files if not f.startswith("main")]
         c_files.sort()
         
         if not c_files:
-            print("No implementation .c files found (excluding main.c)")
-            return False
+            self._log("No implementation .c files found (excluding main.c)")
+        return c_files
+    
+    def matrix(self, c_files=None, opt_levels=(0, 1, 2, 3), flag_sets=None, duration=None, runs=1,
+               syscalls=False, jobs=1, metric=None, compilers=None):
+        """Measure every variant with every compiler, optimization level and flag set.
         
-        print(f"Running performance tests on {len(c_files)} files: {', '.join(c_files)}")
-        print()
+        All binaries are built up front, then the whole grid is measured round
+        by round with the shared run scheduler. Prints a pivoted table of one
+        metric and returns a dict mapping (variant, compiler, opt_level, flags)
+        to PerfResults.
+        """
+        duration = duration or self.perf_duration
+        metric = metric or ("total_syscalls" if syscalls else "insn_per_cycle")
+        c_files = [f if f.endswith(".c") else f"{f}.c" for f in c_files] if c_files else self._variant_files()
+        if not c_files:
+            return {}
+        flag_sets = [tuple(flags) for flags in flag_sets] if flag_sets else [()]
+        compilers = list(compilers or [self.cc])
+        for cc in list(compilers):
+            if not shutil.which(cc):
+                self._log(f"Warning: Compiler {cc} not found, skipping it")
+                compilers.remove(cc)
+        if not compilers:
+            self._log("Error: None of the compilers is available")
+            return {}
+        for cc in compilers:
+            self._log(f"Compiler {cc}: {self._compiler_id(cc)[1] or 'unknown version'}")
+        
+        try:
+            cpus = self._scheduler_cpus(jobs) if jobs > 1 else (self._run_cpus() or [None])[:1]
+        except ValueError as e:
+            self._log(f"Error: {e}")
+            return {}
         
-        success_count = 0
+        # Build every grid cell straight to its own binary, so runs of all cells can be
+        # interleaved and a grid larger than the build cache cannot evict its own cells
+        matrix_dir = os.path.join(os.path.relpath(self.cache_dir, self.working_dir), "matrix")
+        os.makedirs(matrix_dir, exist_ok=True)
+        outputs = {}
+        for cc in compilers:
+            for flags_index, flags in enumerate(flag_sets):
+                pattern = os.path.join(matrix_dir, f"{{basename}}-{os.path.basename(cc)}-O{{level}}"
+                                       + (f"-{flags_index}" if flags else ""))
+                for filename in c_files:
+                    for level in opt_levels:
+                        output = pattern.format(basename=os.path.splitext(filename)[0], level=level)
+                        outputs[(filename, cc, level, flags)] = output
+                        # A stale binary from an earlier campaign must not stand in for a failed build
+                        if os.path.exists(output):
+                            os.remove(output)
+                self._log(f"Building with {' '.join([cc] + list(flags))}")
+                self.build_all(c_files, opt_levels, flags, cc, output_pattern=pattern)
+        self._log()
+        
+        cells = {}
+        sessions = {}
+        missing = []
         for filename in c_files:
-            print(f"{'='*60}")
-            print(f"Testing {filename}")
-            print(f"{'='*60}")
-            
-            if self.perf(filename, duration, runs, syscalls, quiet_runs=True):
-                success_count += 1
+            basename = os.path.splitext(filename)[0]
+            for cc in compilers:
+                for flags in flag_sets:
+                    for level in opt_levels:
+                        binary = outputs[(filename, cc, level, flags)]
+                        if not os.path.exists(binary):
+                            missing.append(binary)
+                            continue
+                        cells[binary] = (basename, cc, level, flags)
+                        sessions[binary] = {"variant": basename, "opt_level": level,
+                                            "compiler": " ".join(self._compiler_id(cc)),
+                                            "cflags": " ".join(self.cflags + list(flags))}
+        if missing:
+            self._log(f"Warning: {len(missing)} grid cell{'s' if len(missing) > 1 else ''} failed to build: "
+                      f"{', '.join(os.path.basename(binary) for binary in missing)}")
+        if not cells:
+            self._log("No binaries to measure")
+            return {}
+        
+        # Round by round, so drift during the campaign affects all cells alike
+        tasks = [binary for _ in range(runs) for binary in cells]
+        mode_desc = self._mode_desc(syscalls)
+        cpu_desc = f"CPU {', '.join(map(str, cpus))}" if cpus != [None] else "no pinning"
+        self._log(f"Running {len(tasks)} runs of {duration:g} seconds for {len(cells)} grid cells "
+                  f"({cpu_desc}, measuring {mode_desc})...")
+        self._log("Runs: ", end="", flush=True)
+        tables = self._schedule_runs(tasks, duration, syscalls, cpus, sessions)
+        self._log()
+        
+        results = {cell: self._perf_result(cell[0], duration, syscalls, tables[binary])
+                   for binary, cell in cells.items() if tables.get(binary)}
+        failed_runs = [os.path.basename(binary) for binary in cells if not tables.get(binary)]
+        if failed_runs:
+            self._log(f"Warning: no successful runs for {len(failed_runs)} grid "
+                      f"cell{'s' if len(failed_runs) > 1 else ''}: {', '.join(failed_runs)}")
+        if not self.quiet:
+            self._display_matrix(results, [os.path.splitext(f)[0] for f in c_files], compilers, opt_levels,
+                                 flag_sets, metric, syscalls)
+        return results
+    
+    def _display_matrix(self, results, basenames, compilers, opt_levels, flag_sets, metric, syscalls=False):
+        """Display one metric of a matrix campaign with variants as rows and builds as columns."""
+        names = dict(self._metrics_info(RunTable.from_rows([{metric: 0}]), syscalls))
+        columns = [(cc, level, flags) for cc in compilers for flags in flag_sets for level in opt_levels]
+        # Only name the compiler when there is more than one
+        labels = [" ".join(([os.path.basename(cc)] if len(compilers) > 1 else []) + [f"-O{level}"] + list(flags))
+                  for cc, level, flags in columns]
+        width = max([15] + [len(label) for label in labels])
+        
+        print(f"\n {names.get(metric, metric)} (mean, ± std dev %) by variant and build:")
+        print("=" * (16 + (width + 1) * len(columns)))
+        print(f"{'Variant':<16}" + "".join(f" {label:>{width}}" for label in labels))
+        print("-" * (16 + (width + 1) * len(columns)))
+        for basename in basenames:
+            cells = []
+            for cc, level, flags in columns:
+                result = results.get((basename, cc, level, flags))
+                stats = result.table.stats(metric) if result else None
+                if stats is None:
+                    cells.append(f"{'-':>{width}}")
+                    continue
+                if metric.endswith('_time') or metric == 'time_elapsed':
+                    value = f"{stats.mean:.6f}"
+                elif metric.endswith('_pct') or metric in RATIO_METRICS:
+                    value = f"{stats.mean:.3f}"
+                else:
+                    value = f"{stats.mean:,.0f}"
+                if stats.count > 1:
+                    value += f" ±{stats.stdev_pct:.1f}%"
+                cells.append(f"{value:>{width}}")
+            print(f"{basename:<16}" + "".join(f" {cell}" for cell in cells))
+        print()
+    
+    def _perf_all_concurrent(self, c_files, duration, runs, syscalls, jobs):
+        """Measure all variants with several runs in flight, each pinned to its own core."""
+        duration = duration or self.perf_duration
+        try:
+            cpus = self._scheduler_cpus(jobs)
+        except ValueError as e:
+            self._log(f"Error: {e}")
+            return {}
+        
+        # The build phase of perf_all already put the binaries in place
+        basenames = [os.path.splitext(filename)[0] for filename in c_files]
+        
+        cached = {}
+        if self.reuse_results:
+            for basename in basenames:
+                cached[basename] = self._stored_runs(basename, duration, syscalls, runs, cpus=_format_cpus(cpus))
+            reused = sum(len(runs_) for runs_ in cached.values())
+            if reused:
+                self._log(f"Reusing {reused} stored runs")
+        tasks = [basename for basename in basenames for _ in range(runs - len(cached.get(basename, [])))]
+        mode_desc = self._mode_desc(syscalls)
+        self._log(f"\nRunning {len(tasks)} runs of {duration:g} seconds on {len(cpus)} CPU{'s' if len(cpus) > 1 else ''} "
+                  f"concurrently (CPU {', '.join(map(str, cpus))}, measuring {mode_desc})...")
+        self._log("Runs: ", end="", flush=True)
+        results = self._schedule_runs(tasks, duration, syscalls, cpus)
+        self._log()
+        for basename, stored in cached.items():
+            table = RunTable.from_rows(stored)
+            if basename in results:
+                table.extend(results[basename].rows())
+            results[basename] = table
+        
+        perf_results = {}
+        for basename in basenames:
+            self._log(f"{'='*60}")
+            self._log(f"Results for {basename}.c")
+            self._log(f"{'='*60}")
+            if results.get(basename):
+                if not self.quiet:
+                    self._display_perf_results(results[basename], basename, duration, runs, syscalls)
+                    if self.show_prediction and not syscalls:
+                        self._display_prediction(results[basename], basename)
+                    note = self._asm_note(basename)
+                    if note:
+                        print(note)
+                        print()
+                perf_results[basename] = self._perf_result(basename, duration, syscalls, results[basename])
             else:
-                print(f"Failed to run perf test for {filename}")
+                self._log(f"Failed to run perf test for {basename}.c")
         
-        print(f"\nCompleted perf tests: {success_count}/{len(c_files)} successful")
-        return success_count > 0
+        self._log(f"\nCompleted perf tests: {len(perf_results)}/{len(c_files)} successful")
+        return perf_results
     
-    def _parse_perf_output(self, output, syscalls=False, expected_duration=None):
-        """Parse perf stat output and extract metrics."""
-        import re
+    def _scheduler_cpus(self, jobs):
+        """Pick up to jobs CPUs for concurrent runs.
         
-        metrics = {}
-        lines = output.split('\n')
-        
-        for line in lines:
-            if syscalls:
-                # Parse raw syscalls line like: "123      raw_syscalls:sys_enter"
-                raw_syscall_match = re.match(r'\s*([\d,]+)\s+raw_syscalls:sys_enter', line)
-                if raw_syscall_match:
-                    value_str = raw_syscall_match.group(1).replace(',', '')
-                    try:
-                        metrics["total_syscalls"] = int(value_str)
-                    except ValueError:
-                        continue
-                
-                # Also parse individual syscall lines like: "123      syscalls:sys_enter_clock_gettime"
-                # (in case both are available)
-                syscall_match = re.match(r'\s*([\d,]+)\s+syscalls:sys_enter_(\w+)', line)
-                if syscall_match:
-                    value_str = syscall_match.group(1).replace(',', '')
-                    syscall_name = syscall_match.group(2)
-                    try:
-                        count = int(value_str)
-                        if count > 0:  # Only store non-zero syscalls
-                            metrics[f"syscall_{syscall_name}"] = count
-                    except ValueError:
-                        continue
+        An explicit CPU list is used as given. Otherwise every run gets a
+        physical core of its own, and the first reserved_cpus cores are kept
+        free for housekeeping.
+        """
+        if not hasattr(os, "sched_setaffinity"):
+            raise ValueError("Concurrent runs require CPU pinning, which is only supported on Linux")
+        if self.cpus is not None:
+            return self._run_cpus()[:jobs]
+        # One hardware thread per core, so the reserve and concurrent runs never share a core
+        cpus = _without_smt_siblings(sorted(os.sched_getaffinity(0)))[self.reserved_cpus:]
+        if not cpus:
+            raise ValueError(f"No cores left after reserving {self.reserved_cpus} for housekeeping")
+        return cpus[:jobs]
+    
+    def _schedule_runs(self, tasks, duration, syscalls, cpus, sessions=None):
+        """Run every task (a variant basename) once, at most one run per CPU at a time.
+        
+        sessions optionally maps tasks to overrides of their stored session
+        info. Returns the parsed metrics of all successful runs grouped by task.
+        """
+        import queue
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        
+        free_cpus = queue.Queue()
+        for cpu in cpus:
+            free_cpus.put(cpu)
+        output_lock = threading.Lock()
+        
+        def run_task(basename):
+            cpu = free_cpus.get()
+            try:
+                parsed = self._measure_run(basename, duration, syscalls, cpu)
+                error = None if parsed else "failed to parse perf output"
+            except subprocess.CalledProcessError as e:
+                parsed, error = None, f"error running perf: {e}"
+            except FileNotFoundError:
+                parsed, error = None, "'perf' command not found"
+            except OSError as e:
+                parsed, error = None, f"error opening performance counters: {e}"
+            finally:
+                free_cpus.put(cpu)
+            with output_lock:
+                self._log("." if parsed else "x", end="", flush=True)
+            return basename, parsed, error
+        
+        results = {}
+        errors = []
+        recorders = {}
+        with ThreadPoolExecutor(max_workers=len(cpus)) as pool:
+            for basename, parsed, error in pool.map(run_task, tasks):
+                if parsed:
+                    results.setdefault(basename, RunTable()).append(parsed)
+                    if basename not in recorders:
+                        session_info = {"cpus": _format_cpus(cpus), **(sessions or {}).get(basename, {})}
+                        recorders[basename] = self._run_recorder(basename, duration, syscalls, **session_info)
+                    recorders[basename](parsed)
+                else:
+                    errors.append(f"{basename}: {error}")
+        
+        if errors:
+            self._log()
+            for error in sorted(set(errors)):
+                self._log(f"Warning: {error}")
+        return results
+    
+    def _run_recorder(self, basename, duration, syscalls=False, **session_info):
+        """Return a function that stores each run of basename in the results database.
+        
+        The session is created with the first stored run, so aborted
+        measurements without any run leave no trace.
+        """
+        if not self.store_results:
+            return lambda parsed: None
+        
+        session = {"id": None, "runs": 0}
+        
+        def record(parsed):
+            if not self.store_results:
+                return
+            try:
+                store = self._result_store()
+                if session["id"] is None:
+                    session["id"] = store.start_session(**self._session_info(basename, duration, syscalls,
+                                                                             **session_info))
+                store.add_run(session["id"], session["runs"], parsed)
+                if isinstance(parsed, IntervalMetrics):
+                    store.add_series(session["id"], session["runs"], parsed.series)
+                session["runs"] += 1
+            except sqlite3.Error as e:
+                self._log(f"\nWarning: Could not store results in {self.results_db}: {e}")
+                self.store_results = False
+        
+        return record
+    
+    def _stored_runs(self, basename, duration, syscalls=False, limit=None, **session_info):
+        """Return stored runs measured with the same binary, machine, duration, mode and CPUs."""
+        if not os.path.exists(self.results_db):
+            return []
+        info = self._session_info(basename, duration, syscalls, **session_info)
+        try:
+            return self._result_store().matching_runs(info, limit)
+        except sqlite3.Error as e:
+            self._log(f"Warning: Could not read stored results from {self.results_db}: {e}")
+            return []
+    
+    def _result_store(self):
+        """Open the results database on first use."""
+        if self._store is None:
+            self._store = ResultStore(self.results_db)
+        return self._store
+    
+    def _session_info(self, basename, duration, syscalls=False, **overrides):
+        """Describe the binary and machine a measurement session runs with."""
+        import datetime
+        import platform
+        
+        # Everything that changes what a run measures goes into the mode, so --reuse only matches alike runs
+        mode = ["syscalls" if syscalls else "combined" if self.with_syscalls else "counters"]
+        if (syscalls or self.with_syscalls) and self.prune_syscalls:
+            mode.append("pruned")
+        if self.wait_phase:
+            mode.append("wait")
+        if self.interval_ms:
+            mode.append(f"interval={self.interval_ms}ms")
+        try:
+            cpus = self._run_cpus()
+        except ValueError:
+            cpus = None
+        info = {
+            "variant": basename,
+            "binary_hash": _file_hash(basename),
+            "opt_level": self.opt_level,
+            "duration": duration,
+            "mode": ":".join(mode),
+            "backend": self.backend,
+            "compiler": " ".join(self._compiler_id()),
+            "cflags": " ".join(self.cflags),
+            "cpus": _format_cpus(cpus),
+            "host": platform.node(),
+            "kernel": platform.release(),
+            "cpu_model": _cpu_model(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        info.update(overrides)
+        return info
+    
+    def show_results(self, variant=None, session_id=None, limit=20):
+        """List stored measurement sessions or re-render the table of one session."""
+        if not os.path.exists(self.results_db):
+            print(f"No results stored yet ({self.results_db} does not exist)")
+            return False
+        store = self._result_store()
+        
+        if session_id is not None:
+            info = store.session(session_id)
+            if info is None:
+                print(f"Error: No session with id {session_id}")
+                return False
+            runs = store.runs(session_id)
+            print(f"Session {info['id']}: {info['variant']} -O{info['opt_level']} measured on "
+                  f"{info['host']} at {info['timestamp']} ({info['backend']} backend)")
+            print(f"Binary {info['binary_hash'][:16]}, kernel {info['kernel']}, {info['cpu_model']}")
+            if info['compiler']:
+                print(f"Built with {info['compiler']}{' ' + info['cflags'] if info['cflags'] else ''}")
+            print(f"Mode {info['mode']}, {'pinned to CPU ' + info['cpus'] if info['cpus'] else 'no CPU pinning'}")
+            if not runs:
+                print("The session contains no runs")
+                return False
+            self._display_perf_results(runs, info['variant'], info['duration'], len(runs),
+                                       info['mode'].split(":")[0] == "syscalls")
+            series = store.series(session_id)
+            if series:
+                self._display_intervals(series, info['variant'], info['duration'])
+            return True
+        
+        sessions = store.sessions(variant, limit)
+        if not sessions:
+            print(f"No stored sessions{f' for {variant}' if variant else ''}")
+            return False
+        print(f"{'ID':>5} {'Timestamp':<20} {'Variant':<16} {'Opt':>3} {'Duration':>8} {'Mode':<24} {'Runs':>5} {'Host':<16}")
+        print("-" * 95)
+        for info in sessions:
+            print(f"{info['id']:>5} {info['timestamp']:<20} {info['variant']:<16} {'-O' + str(info['opt_level']):>3} "
+                  f"{info['duration']:>8g} {info['mode']:<24} {info['runs']:>5} {info['host']:<16}")
+        return True
+    
+    def _measure_run(self, basename, duration, syscalls=False, cpu=None):
+        """Measure a single run of a compiled variant, optionally pinned to one CPU."""
+        if self.backend == "direct":
+            parsed = self._measure_direct(f"./{basename}", duration, cpu)
+        else:
+            working_set = self._syscall_working_set(basename, duration, cpu) if syscalls or self.with_syscalls else None
+            cmd = self._perf_stat_command(syscalls, working_set) + ["--", f"./{basename}", f"{duration:g}"]
+            stderr, rusage = self._run_perf_command(cmd, cpu)
+            # Parse the stderr output (perf writes to stderr)
+            if self.interval_ms:
+                parsed = self._parse_perf_intervals(stderr, syscalls, duration)
             else:
-                # Parse counter lines like: "19,791,669,777      cycles"
-                counter_match = re.match(r'\s*([\d,]+)\s+(\w+[-\w]*)', line)
-                if counter_match:
-                    value_str = counter_match.group(1).replace(',', '')
-                    metric = counter_match.group(2)
-                    try:
-                        metrics[metric] = int(value_str)
-                    except ValueError:
-                        continue
-                
-                # Parse instructions per cycle: "instructions # 0.65 insn per cycle"
-                ipc_match = re.search(r'instructions\s+#\s+([\d.]+)\s+insn per cycle', line)
-                if ipc_match:
-                    metrics['insn_per_cycle'] = float(ipc_match.group(1))
+                parsed = self._parse_perf_output(stderr, syscalls, duration, rusage)
+        return self._with_cpu(parsed, cpu)
+    
+    def _syscall_working_set(self, basename, duration, cpu=None):
+        """Return the syscalls the binary makes, or None to trace all of them.
+        
+        The set comes from a separate discovery run with every tracepoint
+        attached, which is not part of the measurement, and is cached per
+        binary hash so later invocations skip the discovery.
+        """
+        import json
+        import threading
+        
+        if not self.prune_syscalls:
+            return None
+        binary_hash = _file_hash(basename)
+        if binary_hash in self._syscall_sets:
+            return self._syscall_sets[binary_hash]
+        
+        cache_path = os.path.join(self.cache_dir, "syscall-sets", f"{binary_hash}.json")
+        try:
+            with open(cache_path) as f:
+                self._syscall_sets[binary_hash] = json.load(f)
+            return self._syscall_sets[binary_hash]
+        except (OSError, ValueError):
+            pass
+        
+        cmd = ["perf", "stat", "-x", PERF_CSV_SEPARATOR, "-e", ",".join(PERF_SYSCALL_EVENTS),
+               "--", f"./{basename}", f"{duration:g}"]
+        # Always the whole process, the cached set is shared by runs with and without --wait-phase
+        stderr, _ = self._run_perf_command(cmd, cpu, wait_phase=False)
+        parsed = self._parse_perf_output(stderr, syscalls=True)
+        if not parsed:
+            return None
+        # Syscalls the discovery run missed still show up in syscall_other
+        working_set = sorted(metric[len('syscall_'):] for metric in parsed
+                             if metric.startswith('syscall_') and metric != 'syscall_other')
+        
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Concurrent runs may discover the same binary, each thread writes its own temporary file
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(working_set, f)
+        os.replace(tmp_path, cache_path)
+        self._syscall_sets[binary_hash] = working_set
+        return working_set
+    
+    def _run_cpus(self):
+        """Return the CPUs runs are pinned to (round robin), or None without pinning."""
+        if self.cpus is None and not self.avoid_smt:
+            return None
+        if not hasattr(os, "sched_setaffinity"):
+            raise ValueError("CPU pinning is only supported on Linux")
+        
+        allowed = os.sched_getaffinity(0)
+        cpus = sorted(allowed) if self.cpus is None else list(self.cpus)
+        not_allowed = [cpu for cpu in cpus if cpu not in allowed]
+        if not_allowed:
+            raise ValueError(f"CPU(s) {', '.join(map(str, not_allowed))} not available to this process")
+        if self.avoid_smt:
+            cpus = _without_smt_siblings(cpus)
+        return cpus
+    
+    def _perf_stat_command(self, syscalls=False, working_set=None):
+        """Build the machine-readable perf stat command line (without the workload).
+        
+        working_set restricts the syscall tracepoints to the given syscall names.
+        """
+        syscall_events = list(PERF_SYSCALL_EVENTS)
+        if working_set is not None:
+            syscall_events = syscall_events[:1] + [f"syscalls:sys_enter_{name}" for name in working_set]
+        if syscalls:
+            # Count both total syscalls and individual syscalls
+            events = syscall_events
+        elif self.with_syscalls:
+            # One group keeps the hardware counters scheduled together, so the
+            # tracepoints (software events) never cause them to be multiplexed
+            events = PERF_SOFTWARE_EVENTS + ["{" + ",".join(PERF_HARDWARE_EVENTS) + "}"] + syscall_events
+        else:
+            events = list(PERF_COUNTER_EVENTS)
+        if self.interval_ms:
+            # Time tool events are not printed per interval; the timestamps and task-clock replace them
+            return ["perf", "stat", "-x", PERF_CSV_SEPARATOR, "-I", str(self.interval_ms), "-e", ",".join(events)]
+        events.append("duration_time")
+        if self._perf_has_time_events():
+            events.extend(["user_time", "system_time"])
+        return ["perf", "stat", "-x", PERF_CSV_SEPARATOR, "-e", ",".join(events)]
+    
+    def _mode_desc(self, syscalls=False):
+        """Describe what a measurement in the given mode counts."""
+        if syscalls:
+            return "syscalls"
+        return "performance counters and syscalls" if self.with_syscalls else "performance counters"
+    
+    def _perf_has_time_events(self):
+        """Check once whether perf knows the user_time/system_time tool events."""
+        if not hasattr(self, "_time_events_supported"):
+            try:
+                result = subprocess.run(["perf", "stat", "-x", PERF_CSV_SEPARATOR,
+                                         "-e", "user_time,system_time", "--", "true"],
+                                        capture_output=True, text=True)
+                self._time_events_supported = result.returncode == 0
+            except FileNotFoundError:
+                self._time_events_supported = False
+        return self._time_events_supported
+    
+    def _run_perf_command(self, cmd, cpu=None, wait_phase=True):
+        """Run a perf command and return its stderr and the resource usage of the process tree.
+        
+        wait_phase=False counts the whole process even with --wait-phase.
+        """
+        # Force the C locale so perf never prints localized decimal separators
+        env = dict(os.environ, LC_ALL="C")
+        with _pinned(cpu), self._wait_phase_control(cmd, env, wait_phase) as (cmd, fds):
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    text=True, env=env, pass_fds=fds)
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        
+        # Reap the process ourselves to get its rusage (includes the waited-for workload)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr)
+        return stderr, rusage
+    
+    @contextlib.contextmanager
+    def _wait_phase_control(self, cmd, env, enabled=True):
+        """Let the workload enable perf's counters only around my_wait (perf stat --control).
+        
+        Yields the perf command with the control options and the file descriptors
+        perf and the workload must inherit; they are closed once perf is started.
+        """
+        if not self.wait_phase or not enabled:
+            yield cmd, ()
+            return
+        ctl_read, ctl_write = os.pipe()
+        ack_read, ack_write = os.pipe()
+        fds = (ctl_read, ctl_write, ack_read, ack_write)
+        try:
+            # Start with disabled counters, main.h sends enable/disable around the wait
+            split = cmd.index("--")
+            cmd = cmd[:split] + ["-D", "-1", "--control", f"fd:{ctl_read},{ack_write}"] + cmd[split:]
+            env.update(WASTE_CPU_PERF_CTL_FD=str(ctl_write), WASTE_CPU_PERF_ACK_FD=str(ack_read))
+            yield cmd, fds
+        finally:
+            for fd in fds:
+                os.close(fd)
+    
+    def _perf_repeat_runs(self, basename, duration, runs, syscalls=False, cpu=None):
+        """Repeat the workload inside a single perf process and yield parsed metrics per run.
+        
+        perf stat -r 0 repeats the workload forever and prints the counters after
+        each run, so the event set is resolved and attached only once. The output
+        is split into per-run blocks and perf is stopped after the requested runs.
+        """
+        import signal
+        
+        working_set = self._syscall_working_set(basename, duration, cpu) if syscalls or self.with_syscalls else None
+        cmd = self._perf_stat_command(syscalls, working_set) + ["-r", "0", "--", f"./{basename}", f"{duration:g}"]
+        env = dict(os.environ, LC_ALL="C")
+        with _pinned(cpu), self._wait_phase_control(cmd, env) as (cmd, fds):
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    text=True, env=env, pass_fds=fds, start_new_session=True)
+        
+        completed = 0
+        block = []
+        block_size = None
+        try:
+            for line in proc.stderr:
+                fields = line.rstrip('\n').split(PERF_CSV_SEPARATOR)
+                if len(fields) < 3 or line.startswith('#'):
+                    continue
                 
-                # Parse cache miss percentage: "cache-misses # 2.93% of all cache refs"
-                cache_miss_pct_match = re.search(r'cache-misses\s+#\s+([\d.]+)%\s+of all cache refs', line)
-                if cache_miss_pct_match:
-                    metrics['cache_miss_pct'] = float(cache_miss_pct_match.group(1))
+                # The first block ends when its first event shows up again
+                if block_size is None and block and fields[2] == block[0].split(PERF_CSV_SEPARATOR)[2]:
+                    block_size = len(block)
+                    completed += 1
+                    yield self._with_cpu(self._parse_perf_output(''.join(block), syscalls, duration), cpu)
+                    block = []
+                    if completed == runs:
+                        break
                 
-                # Parse branch miss percentage: "branch-misses # 15.22% of all branches"
-                branch_miss_pct_match = re.search(r'branch-misses\s+#\s+([\d.]+)%\s+of all branches', line)
-                if branch_miss_pct_match:
-                    metrics['branch_miss_pct'] = float(branch_miss_pct_match.group(1))
+                block.append(line)
+                if block_size is not None and len(block) == block_size:
+                    completed += 1
+                    yield self._with_cpu(self._parse_perf_output(''.join(block), syscalls, duration), cpu)
+                    block = []
+                    if completed == runs:
+                        break
+        finally:
+            # Stop perf together with the run it already started
+            if proc.poll() is None:
+                os.killpg(proc.pid, signal.SIGKILL)
+            proc.stderr.close()
+            proc.wait()
+        
+        if completed < runs:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    
+    def _with_cpu(self, parsed, cpu):
+        """Record the CPU a run was pinned to in its metrics."""
+        if parsed and cpu is not None:
+            parsed['cpu'] = cpu
+        return parsed
+    
+    def _measure_direct(self, binary, duration, cpu=None):
+        """Measure one run with hardware counters opened via perf_event_open(2).
+        
+        The child is forked and blocks on a pipe until the parent attached the
+        counters to it; they start counting when the child execs the binary.
+        """
+        import struct
+        import time
+        
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(write_fd)
+                if cpu is not None:
+                    os.sched_setaffinity(0, {cpu})
+                os.read(read_fd, 1)
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, 1)
+                os.execv(binary, [binary, f"{duration:g}"])
+            finally:
+                os._exit(127)
+        os.close(read_fd)
+        
+        fds = {}
+        try:
+            for event, config in PERF_HW_EVENTS.items():
+                fd = _perf_event_open(PERF_TYPE_HARDWARE, config, pid)
+                if fd is not None:
+                    fds[event] = fd
+            if not fds:
+                raise OSError("no hardware performance counters available")
+        except OSError:
+            os.kill(pid, 9)
+            os.close(write_fd)
+            os.waitpid(pid, 0)
+            for fd in fds.values():
+                os.close(fd)
+            raise
+        
+        start = time.perf_counter()
+        os.write(write_fd, b"x")
+        os.close(write_fd)
+        _, status, rusage = os.wait4(pid, 0)
+        elapsed = time.perf_counter() - start
+        
+        metrics = {}
+        running_pcts = []
+        for event, fd in fds.items():
+            value, enabled, running = struct.unpack("QQQ", os.read(fd, 24))
+            os.close(fd)
+            if running == 0:
+                continue  # never scheduled, equivalent to <not counted>
+            # Scale multiplexed counters to the full run like perf stat does
+            metrics[event] = int(round(value * enabled / running))
+            running_pcts.append(running / enabled * 100)
+        
+        if not os.WIFEXITED(status) or os.WEXITSTATUS(status) != 0:
+            self._log(f"\nWarning: {binary} exited with status {status}")
+        
+        if running_pcts:
+            metrics['counter_running_pct'] = min(running_pcts)
+        metrics['time_elapsed'] = elapsed
+        metrics['user_time'] = rusage.ru_utime
+        metrics['sys_time'] = rusage.ru_stime
+        return self._add_derived_metrics(metrics, False, duration)
+    
+    def _parse_perf_csv(self, output):
+        """Parse perf stat -x output into PerfCounter records in a single pass."""
+        counters = []
+        for line in output.split('\n'):
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(PERF_CSV_SEPARATOR)
+            if len(fields) < 3:
+                continue
             
-            # Parse time lines (common for both modes)
-            time_match = re.search(r'(\d+\.\d+)\s+seconds\s+time\s+elapsed', line)
-            if time_match:
-                metrics['time_elapsed'] = float(time_match.group(1))
+            # perf inserts a variance column ("0.12%") when repeating runs
+            if len(fields) > 3 and fields[3].endswith('%'):
+                del fields[3]
             
-            user_match = re.search(r'(\d+\.\d+)\s+seconds\s+user', line)
-            if user_match:
-                metrics['user_time'] = float(user_match.group(1))
-                
-            sys_match = re.search(r'(\d+\.\d+)\s+seconds\s+sys', line)
-            if sys_match:
-                metrics['sys_time'] = float(sys_match.group(1))
+            value_str, unit, event = fields[0], fields[1], fields[2]
+            try:
+                value = float(value_str)
+            except ValueError:
+                # "<not counted>" or "<not supported>"
+                value = None
+            
+            # Hybrid CPUs report events per PMU, e.g. "cpu_core/cycles/"
+            if event.endswith('/') and '/' in event[:-1]:
+                event = event[:-1].rsplit('/', 1)[1]
+            
+            run_time = int(fields[3]) if len(fields) > 3 and fields[3].isdigit() else None
+            try:
+                pct_running = float(fields[4]) if len(fields) > 4 else None
+            except ValueError:
+                pct_running = None
+            counters.append(PerfCounter(event, value, unit, run_time, pct_running))
+        return counters
+    
+    def _parse_perf_output(self, output, syscalls=False, expected_duration=None, rusage=None):
+        """Parse perf stat output and extract metrics.
+        
+        Syscalls without a traced sys_enter tracepoint (e.g. outside of a pruned
+        working set) are counted as syscall_other.
+        """
+        metrics = {}
+        running_pcts = []
+        
+        for counter in self._parse_perf_csv(output):
+            if counter.value is None:
+                continue
+            event = counter.event
+            
+            if event in PERF_TIME_EVENTS:
+                seconds = counter.value / PERF_TIME_UNITS.get(counter.unit, 1e9)
+                key = PERF_TIME_EVENTS[event]
+                metrics[key] = metrics.get(key, 0.0) + seconds
+            elif event == "raw_syscalls:sys_enter":
+                metrics["total_syscalls"] = int(counter.value)
+            elif event.startswith("syscalls:sys_enter_"):
+                count = int(counter.value)
+                if count > 0:  # Only store non-zero syscalls
+                    metrics[f"syscall_{event[len('syscalls:sys_enter_'):]}"] = count
+            elif not counter.unit:
+                # Plain event counts; sum duplicates reported by several PMUs
+                metrics[event] = metrics.get(event, 0) + int(counter.value)
+                if counter.pct_running is not None:
+                    running_pcts.append(counter.pct_running)
+        
+        if running_pcts:
+            metrics['counter_running_pct'] = min(running_pcts)
+        
+        if 'total_syscalls' in metrics:
+            other = metrics['total_syscalls'] - sum(value for metric, value in metrics.items()
+                                                    if metric.startswith('syscall_'))
+            if other > 0:
+                metrics['syscall_other'] = other
+        
+        # Without perf's time tool events fall back to the rusage of the perf process tree
+        if rusage is not None:
+            metrics.setdefault('user_time', rusage.ru_utime)
+            metrics.setdefault('sys_time', rusage.ru_stime)
+        
+        return self._add_derived_metrics(metrics, syscalls, expected_duration)
+    
+    def _parse_perf_intervals(self, output, syscalls=False, expected_duration=None):
+        """Parse perf stat -I output into run totals with the per-interval time series attached.
+        
+        There are no user and system times: the only source would be the rusage
+        of the perf process tree, which includes perf's own work every interval.
+        """
+        blocks = {}
+        for line in output.split('\n'):
+            if not line or line.startswith('#'):
+                continue
+            # Every line starts with the timestamp of its interval
+            timestamp, _, rest = line.partition(PERF_CSV_SEPARATOR)
+            try:
+                blocks.setdefault(float(timestamp), []).append(rest)
+            except ValueError:
+                continue
+        
+        series = RunTable()
+        totals = {}
+        previous = 0.0
+        for timestamp in sorted(blocks):
+            metrics = self._parse_perf_output('\n'.join(blocks[timestamp]), syscalls)
+            if not metrics:
+                continue
+            interval = timestamp - previous
+            previous = timestamp
+            for metric, value in metrics.items():
+                if metric == 'counter_running_pct':
+                    totals[metric] = min(totals.get(metric, value), value)
+                elif isinstance(value, int) or metric == 'task_time':
+                    totals[metric] = totals.get(metric, 0) + value
+            metrics.update(time=timestamp, interval=interval)
+            if metrics.get('cycles') and interval > 0:
+                metrics['ghz'] = metrics['cycles'] / interval / 1e9
+            series.append(metrics)
+        if not len(series):
+            return None
+        
+        # The last interval ends when the workload exits
+        totals['time_elapsed'] = previous
+        totals.update(self._interval_summary(series))
+        return IntervalMetrics(self._add_derived_metrics(totals, syscalls, expected_duration), series)
+    
+    def _interval_summary(self, series):
+        """Derive warm-up time, frequency ramp and steady-state IPC from one run's intervals."""
+        times = series.column('time')
+        intervals = series.column('interval')
+        ipcs = series.column('insn_per_cycle')
+        ghz = series.column('ghz')
+        if len(ipcs) != len(times) or len(ghz) != len(times) or len(times) < 2:
+            return {}
+        # The final interval is cut short by the exit of the workload
+        if len(times) > 2 and intervals[-1] < intervals[0] / 2:
+            times, ipcs, ghz = times[:-1], ipcs[:-1], ghz[:-1]
+        
+        steady_ipc = _percentile(sorted(ipcs[len(ipcs) // 2:]), 50)
+        steady_ghz = _percentile(sorted(ghz[len(ghz) // 2:]), 50)
+        # Warmed up from the first interval after which the IPC stays close to its steady state
+        warmed_up = len(ipcs)
+        while warmed_up > 0 and abs(ipcs[warmed_up - 1] - steady_ipc) <= WARMUP_TOLERANCE * steady_ipc:
+            warmed_up -= 1
+        steady = ipcs[warmed_up:] or ipcs[-1:]
+        return {
+            'warmup_time': times[warmed_up - 1] if warmed_up else 0.0,
+            'start_ghz': ghz[0],
+            'steady_ghz': steady_ghz,
+            'steady_insn_per_cycle': math.fsum(steady) / len(steady),
+        }
+    
+    def _add_derived_metrics(self, metrics, syscalls=False, expected_duration=None):
+        """Add ratios and time accuracy to raw metrics; returns None for empty metrics."""
+        if metrics.get('cycles'):
+            if 'instructions' in metrics:
+                metrics['insn_per_cycle'] = metrics['instructions'] / metrics['cycles']
+        if metrics.get('cache-references') and 'cache-misses' in metrics:
+            metrics['cache_miss_pct'] = metrics['cache-misses'] / metrics['cache-references'] * 100
+        if metrics.get('branches') and 'branch-misses' in metrics:
+            metrics['branch_miss_pct'] = metrics['branch-misses'] / metrics['branches'] * 100
+        # A rate of the wait loop only makes sense without the loader's syscalls
+        if expected_duration and self.wait_phase and 'total_syscalls' in metrics:
+            metrics['syscalls_per_second'] = metrics['total_syscalls'] / expected_duration
         
         # Calculate system time percentage for non-syscall mode
         if not syscalls and 'user_time' in metrics and 'sys_time' in metrics:
@@ -284,45 +2244,10 @@ class WasteCpuManager:
         
         return metrics if metrics else None
     
-    def _display_perf_results(self, results, basename, duration, runs, syscalls=False):
-        """Display perf results in a formatted table."""
-        import statistics
-        
-        if not results:
-            return
-            
-        mode_desc = "Syscalls" if syscalls else "Performance"
-        print(f"\n {mode_desc} Results for {basename} ({runs} run{'s' if runs > 1 else ''}):")
-        print("=" * 80)
-        
+    def _metrics_info(self, results, syscalls=False):
+        """Return (metric key, display name) pairs shown for a run table, in display order."""
         if syscalls:
-            # For syscalls, dynamically find all syscall metrics and filter out zeros
-            all_syscalls = {}
-            for result in results:
-                for key, value in result.items():
-                    if key.startswith('syscall_') and value > 0:
-                        if key not in all_syscalls:
-                            all_syscalls[key] = []
-                        all_syscalls[key].append(value)
-            
-            metrics_info = []
-            # Add total syscalls count first if available
-            if any('total_syscalls' in result for result in results):
-                metrics_info.append(('total_syscalls', 'Total Syscalls'))
-            
-            # Sort syscalls by average count (highest first)
-            syscall_averages = []
-            for syscall, values in all_syscalls.items():
-                avg_count = sum(values) / len(values)
-                syscall_averages.append((syscall, avg_count))
-            
-            # Sort by average count in descending order
-            syscall_averages.sort(key=lambda x: x[1], reverse=True)
-            
-            # Add individual syscalls ordered by count
-            for syscall, _ in syscall_averages:
-                display_name = syscall.replace('syscall_', '').replace('_', ' ').title()
-                metrics_info.append((syscall, display_name))
+            metrics_info = self._syscall_metrics_info(results)
             
             # Add timing metrics
             metrics_info.extend([
@@ -341,16 +2266,81 @@ class WasteCpuManager:
                 ('cache-misses', 'Cache Misses'),
                 ('cache_miss_pct', 'Cache Miss %'),
                 ('branches', 'Branches'),
-                ('branch-instructions', 'Branch Instr'),
                 ('branch-misses', 'Branch Misses'),
                 ('branch_miss_pct', 'Branch Miss %'),
+                ('counter_running_pct', 'Counter Run %'),
                 ('time_elapsed', 'Time Elapsed (s)'),
                 ('time_accuracy_pct', 'Time Accuracy %'),
                 ('user_time', 'User Time (s)'),
                 ('sys_time', 'Sys Time (s)'),
-                ('sys_time_pct', 'Sys Time %')
+                ('sys_time_pct', 'Sys Time %'),
+                ('task_time', 'Task Clock (s)'),
+                ('context-switches', 'Context Switches'),
+                ('cpu-migrations', 'CPU Migrations'),
+                ('page-faults', 'Page Faults'),
+                ('warmup_time', 'Warm-up (s)'),
+                ('start_ghz', 'Start GHz'),
+                ('steady_ghz', 'Steady GHz'),
+                ('steady_insn_per_cycle', 'Steady Insn/Cyc')
             ]
+        return metrics_info
+    
+    def _syscall_metrics_info(self, results):
+        """Return (metric key, display name) pairs of the syscall counts in a run table."""
+        metrics_info = []
+        # Add total syscalls count first if available
+        if 'total_syscalls' in results.index:
+            metrics_info.append(('total_syscalls', 'Total Syscalls'))
+        if 'syscalls_per_second' in results.index:
+            metrics_info.append(('syscalls_per_second', 'Syscalls/s'))
+        
+        # Sort syscalls by average count (highest first), skipping syscalls that never occurred
+        syscall_averages = []
+        for syscall in results.metrics():
+            if syscall.startswith('syscall_'):
+                stats = results.stats(syscall)
+                if stats and stats.max > 0:
+                    syscall_averages.append((syscall, stats.mean))
+        syscall_averages.sort(key=lambda x: x[1], reverse=True)
+        
+        # Add individual syscalls ordered by count
+        for syscall, _ in syscall_averages:
+            display_name = (syscall.replace('syscall_', '').replace('_', ' ').title()
+                            if syscall != 'syscall_other' else 'Other Syscalls')
+            metrics_info.append((syscall, display_name))
+        return metrics_info
+    
+    def _display_perf_results(self, results, basename, duration, runs, syscalls=False):
+        """Display perf results in a formatted table."""
+        if not results:
+            return
+            
+        mode_desc = "Syscalls" if syscalls else "Performance"
+        print(f"\n {mode_desc} Results for {basename} ({runs} run{'s' if runs > 1 else ''}):")
+        print("=" * 80)
+        
+        if not isinstance(results, (RunTable, StreamingTable)):
+            results = RunTable.from_rows(results)
+        
+        used_cpus = sorted(set(results.column('cpu')))
+        if used_cpus:
+            print(f"Pinned to CPU{'s' if len(used_cpus) > 1 else ''}: {', '.join(map(str, used_cpus))}")
+        
+        metrics_info = self._metrics_info(results, syscalls)
+        self._print_metrics_table(results, metrics_info, runs)
         
+        # Combined mode: the same runs also counted the syscalls
+        syscall_info = self._syscall_metrics_info(results) if not syscalls else []
+        if syscall_info:
+            print(f" Syscalls Results for {basename} (same {runs} run{'s' if runs > 1 else ''}):")
+            print("=" * 80)
+            self._print_metrics_table(results, syscall_info, runs)
+        
+        if self.show_distribution and runs > 1:
+            self._display_distribution(results, metrics_info + syscall_info)
+    
+    def _print_metrics_table(self, results, metrics_info, runs):
+        """Print one row per metric: the value of a single run, or mean, std dev, min and max."""
         # Print header
         if runs > 1:
             print(f"{'Metric':<16} {'Mean':>15} {'Std Dev (%)':>15} {'Min':>15} {'Max':>15}")
@@ -361,72 +2351,818 @@ class WasteCpuManager:
         
         # Calculate and display statistics for each metric
         for metric_key, metric_name in metrics_info:
-            values = [r[metric_key] for r in results if metric_key in r]
-            if not values:
+            stats = results.stats(metric_key)
+            if stats is None:
                 continue
                 
-            if runs > 1 and len(values) > 1:
-                mean_val = statistics.mean(values)
-                std_dev = statistics.stdev(values) if len(values) > 1 else 0
-                std_dev_pct = (std_dev / mean_val * 100) if mean_val != 0 else 0
-                min_val = min(values)
-                max_val = max(values)
+            if runs > 1 and stats.count > 1:
+                mean_val = stats.mean
+                std_dev_pct = stats.stdev_pct
+                min_val = stats.min
+                max_val = stats.max
                 
                 if metric_key.endswith('_time') or metric_key == 'time_elapsed':
                     print(f"{metric_name:<16} {mean_val:>15.6f} {std_dev_pct:>14.2f}% {min_val:>15.6f} {max_val:>15.6f}")
-                elif metric_key.endswith('_pct') or metric_key == 'insn_per_cycle':
+                elif metric_key.endswith('_pct') or metric_key in RATIO_METRICS:
                     print(f"{metric_name:<16} {mean_val:>15.3f} {std_dev_pct:>14.2f}% {min_val:>15.3f} {max_val:>15.3f}")
                 else:
-                    print(f"{metric_name:<16} {mean_val:>15,.0f} {std_dev_pct:>14.2f}% {min_val:>15,} {max_val:>15,}")
+                    print(f"{metric_name:<16} {mean_val:>15,.0f} {std_dev_pct:>14.2f}% {min_val:>15,.0f} {max_val:>15,.0f}")
             else:
-                val = values[0]
+                val = results.column(metric_key)[0]
                 if metric_key.endswith('_time') or metric_key == 'time_elapsed':
                     print(f"{metric_name:<16} {val:>15.6f}")
-                elif metric_key.endswith('_pct') or metric_key == 'insn_per_cycle':
+                elif metric_key.endswith('_pct') or metric_key in RATIO_METRICS:
                     print(f"{metric_name:<16} {val:>15.3f}")
                 else:
-                    print(f"{metric_name:<16} {val:>15,}")
+                    print(f"{metric_name:<16} {val:>15,.0f}")
+        
+        print()
+    
+    def _display_intervals(self, series, basename, duration, rows=20):
+        """Display the mean time series over all runs, merged into at most rows lines."""
+        length = min(len(table) for table in series)
+        if not length:
+            return
+        interval_ms = round(series[0].column('interval')[0] * 1000)
+        columns = [metric for metric in ('ghz', 'insn_per_cycle', 'total_syscalls')
+                   if all(len(table.column(metric)) == len(table) for table in series)]
+        names = {'ghz': 'GHz', 'insn_per_cycle': 'Insn/Cycle', 'total_syscalls': 'Syscalls'}
+        step = max(1, math.ceil(length / rows))
+        
+        print(f" Interval profile of {basename} (mean of {len(series)} run{'s' if len(series) > 1 else ''}, "
+              f"{interval_ms} ms intervals):")
+        print(f"{'Until (s)':>10}" + "".join(f" {names[metric]:>12}" for metric in columns))
+        print("-" * (10 + 13 * len(columns)))
+        for start in range(0, length, step):
+            end = min(start + step, length)
+            until = math.fsum(table.column('time')[end - 1] for table in series) / len(series)
+            cells = []
+            for metric in columns:
+                values = [value for table in series for value in table.column(metric)[start:end]]
+                mean = math.fsum(values) / len(values)
+                cells.append(f"{mean:>12,.0f}" if metric == 'total_syscalls' else f"{mean:>12.3f}")
+            print(f"{until:>10.2f}" + "".join(f" {cell}" for cell in cells))
+        
+        warmups = [value for table in series for value in [self._interval_summary(table).get('warmup_time')]
+                   if value is not None]
+        if warmups:
+            warmup = max(warmups)
+            print(f"IPC stays within ±{WARMUP_TOLERANCE * 100:g}% of its steady state after at most {warmup:.2f} s "
+                  f"of the {duration:g} s runs"
+                  + (f"; runs of about {max(2 * warmup, 0.1):.1f} s capture the steady state" if warmup < duration / 4 else ""))
+        print()
+    
+    def _display_distribution(self, results, metrics_info):
+        """Display percentiles and bootstrap confidence intervals of the mean."""
+        import time
+        
+        def fmt(metric_key, value):
+            if metric_key.endswith('_time') or metric_key == 'time_elapsed':
+                return f"{value:>15.6f}"
+            elif metric_key.endswith('_pct') or metric_key in RATIO_METRICS:
+                return f"{value:>15.3f}"
+            return f"{value:>15,.0f}"
+        
+        rows = []
+        started = time.perf_counter()
+        for metric_key, metric_name in metrics_info:
+            values = results.column(metric_key)
+            if len(values) < 2:
+                continue
+            median, p5, p95, p99 = _percentiles(values, (50, 5, 95, 99))
+            low, high = _bootstrap_mean_ci(values, self.bootstrap_iterations)
+            rows.append((metric_key, metric_name, median, p5, p95, p99, low, high))
+        elapsed = time.perf_counter() - started
+        if not rows:
+            return
+        
+        print(f"{'Metric':<16} {'Median':>15} {'P5':>15} {'P95':>15} {'P99':>15}")
+        print("-" * 80)
+        for metric_key, metric_name, median, p5, p95, p99, _, _ in rows:
+            print(f"{metric_name:<16} {fmt(metric_key, median)} {fmt(metric_key, p5)} "
+                  f"{fmt(metric_key, p95)} {fmt(metric_key, p99)}")
+        print()
         
+        print(f"Bootstrap 95% CI of the mean ({self.bootstrap_iterations:,} resamples, {elapsed:.2f}s):")
+        print(f"{'Metric':<16} {'CI Low':>15} {'CI High':>15} {'CI Width (%)':>15}")
+        print("-" * 64)
+        for metric_key, metric_name, _, _, _, _, low, high in rows:
+            center = (low + high) / 2
+            width_pct = (high - low) / 2 / abs(center) * 100 if center != 0 else 0
+            print(f"{metric_name:<16} {fmt(metric_key, low)} {fmt(metric_key, high)} {width_pct:>14.2f}%")
         print()
 
 
+def _percentile(sorted_values, q):
+    """Linearly interpolated q-th percentile (0-100) of an already sorted sequence."""
+    if not len(sorted_values):
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _percentiles(values, qs):
+    """Return the q-th percentiles (0-100) of values for every q in qs."""
+    if np is not None:
+        return [float(p) for p in np.percentile(np.asarray(values, dtype=np.float64), qs)]
+    ordered = sorted(values)
+    return [_percentile(ordered, q) for q in qs]
+
+
+def _planned_looks(rounds, first, looks):
+    """Return the rounds, evenly spread from first to rounds, after which a sequential test looks."""
+    if rounds < first:
+        return []
+    return sorted({max(first, math.ceil(rounds * k / looks)) for k in range(1, looks + 1)})
+
+
+def _pocock_alpha(looks, alpha, paths=20000, seed=0):
+    """Nominal per-look significance level of a Pocock boundary for looks at the given sample sizes.
+    
+    The constant boundary is the 1 - alpha quantile of the largest |z| over
+    all looks, simulated from the random walk of the statistic under the null
+    hypothesis, so crossing it at any look has probability alpha.
+    """
+    if len(looks) <= 1:
+        return alpha
+    rng = random.Random(seed)
+    maxima = []
+    for _ in range(paths):
+        total = 0.0
+        previous = 0
+        peak = 0.0
+        for n in looks:
+            total += rng.gauss(0.0, math.sqrt(n - previous))
+            previous = n
+            peak = max(peak, abs(total) / math.sqrt(n))
+        maxima.append(peak)
+    maxima.sort()
+    return math.erfc(_percentile(maxima, 100 * (1 - alpha)) / math.sqrt(2))
+
+
+def _bootstrap_mean_ci(values, iterations=10000, confidence=95, seed=0):
+    """Percentile bootstrap confidence interval of the mean.
+    
+    With NumPy all resamples are drawn as index matrices and averaged row-wise
+    in chunks; without it the resampling falls back to random.choices.
+    """
+    n = len(values)
+    alpha = (100 - confidence) / 2
+    if np is not None:
+        data = np.asarray(values, dtype=np.float64)
+        rng = np.random.default_rng(seed)
+        # Bound the index matrix to ~8 MB per chunk
+        chunk = max(1, min(iterations, 1_000_000 // n))
+        means = np.empty(iterations)
+        for start in range(0, iterations, chunk):
+            size = min(chunk, iterations - start)
+            means[start:start + size] = data[rng.integers(0, n, size=(size, n))].mean(axis=1)
+        low, high = np.percentile(means, (alpha, 100 - alpha))
+        return float(low), float(high)
+    
+    rng = random.Random(seed)
+    means = sorted(math.fsum(rng.choices(values, k=n)) / n for _ in range(iterations))
+    return _percentile(means, alpha), _percentile(means, 100 - alpha)
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b) (continued fraction expansion)."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    # The continued fraction converges fast only for x < (a + 1) / (a + b + 2)
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - _betainc(b, a, 1.0 - x)
+    
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.0) < 1e-12:
+            break
+    return math.exp(log_front) * result / a
+
+
+def _welch_t_test(a, b):
+    """Welch's unequal variances t-test; returns (t, degrees of freedom, two-sided p-value)."""
+    n_a, n_b = len(a), len(b)
+    if n_a < 2 or n_b < 2:
+        return 0.0, 0.0, 1.0
+    mean_a, mean_b = math.fsum(a) / n_a, math.fsum(b) / n_b
+    var_a = math.fsum((x - mean_a) ** 2 for x in a) / (n_a - 1)
+    var_b = math.fsum((x - mean_b) ** 2 for x in b) / (n_b - 1)
+    se2_a, se2_b = var_a / n_a, var_b / n_b
+    if se2_a + se2_b == 0:
+        return 0.0, 0.0, 1.0 if mean_a == mean_b else 0.0
+    t = (mean_a - mean_b) / math.sqrt(se2_a + se2_b)
+    df = (se2_a + se2_b) ** 2 / (se2_a ** 2 / (n_a - 1) + se2_b ** 2 / (n_b - 1))
+    return t, df, _betainc(df / 2, 0.5, df / (df + t * t))
+
+
+def _mann_whitney_u(a, b):
+    """Mann-Whitney U test with normal approximation; returns (U of a, two-sided p-value)."""
+    n_a, n_b = len(a), len(b)
+    if not n_a or not n_b:
+        return 0.0, 1.0
+    combined = sorted([(x, 0) for x in a] + [(x, 1) for x in b])
+    
+    # Average ranks for ties and the tie correction term
+    rank_sum_a = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        rank_sum_a += rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 0)
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+    
+    u = rank_sum_a - n_a * (n_a + 1) / 2
+    n = n_a + n_b
+    variance = n_a * n_b / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (abs(u - n_a * n_b / 2) - 0.5) / math.sqrt(variance)
+    return u, min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+def _hedges_g(a, b):
+    """Bias-corrected standardized mean difference (b - a) / pooled standard deviation."""
+    n_a, n_b = len(a), len(b)
+    if n_a < 2 or n_b < 2:
+        return 0.0
+    mean_a, mean_b = math.fsum(a) / n_a, math.fsum(b) / n_b
+    var_a = math.fsum((x - mean_a) ** 2 for x in a) / (n_a - 1)
+    var_b = math.fsum((x - mean_b) ** 2 for x in b) / (n_b - 1)
+    pooled = math.sqrt(((n_a - 1) * var_a + (n_b - 1) * var_b) / (n_a + n_b - 2))
+    if pooled == 0:
+        return 0.0
+    correction = 1 - 3 / (4 * (n_a + n_b) - 9)
+    return (mean_b - mean_a) / pooled * correction
+
+
+def _analyze_disassembly(output, binary_hash=""):
+    """Build an AsmAnalysis from objdump -d output of the wait function."""
+    instructions = []
+    in_function = False
+    for line in output.splitlines():
+        if re.match(rf"^[0-9a-f]+ <{WAIT_FUNCTION}>:$", line):
+            in_function = True
+            continue
+        if in_function:
+            match = re.match(r"^\s*([0-9a-f]+):\s+(\S+)\s*(.*)$", line)
+            if not match:
+                if not line.strip():
+                    break
+                continue
+            # Drop objdump's comments like "# 2008 <_IO_stdin_used+0x8>" on rip-relative operands
+            instructions.append([int(match.group(1), 16), match.group(2), match.group(3).split("#")[0].strip()])
+    if not instructions:
+        raise ValueError(f"{WAIT_FUNCTION} not found in the disassembly")
+    
+    start, end = instructions[0][0], instructions[-1][0]
+    loops = []
+    calls = []
+    for address, mnemonic, operands in instructions:
+        target = re.search(r"([0-9a-f]+) <([^>+]+)(\+0x[0-9a-f]+)?>", operands)
+        if not target:
+            continue
+        target_address, symbol = int(target.group(1), 16), target.group(2).split("@")[0]
+        if mnemonic in CALL_MNEMONICS or not start <= target_address <= end:
+            # Calls and tail jumps out of the function
+            calls.append(symbol)
+        elif target_address <= address:
+            loops.append([target_address, address])
+    
+    analysis = AsmAnalysis(binary_hash, instructions, loops, calls=calls,
+                           clock_calls=sum(1 for call in calls if call in CLOCK_FUNCTIONS))
+    # Innermost loops contain no other loop, prefer the shortest one
+    inner = [loop for loop in loops
+             if not any(other != loop and loop[0] <= other[0] and other[1] <= loop[1] for other in loops)]
+    if inner:
+        analysis.inner_loop = min(inner, key=lambda loop: loop[1] - loop[0])
+        analysis.inner_loop_instructions = sum(1 for address, _, _ in instructions
+                                               if analysis.inner_loop[0] <= address <= analysis.inner_loop[1])
+    
+    def has_call(loop):
+        return any(loop[0] <= address <= loop[1] and (mnemonic in CALL_MNEMONICS or "@plt" in operands)
+                   for address, mnemonic, operands in instructions)
+    analysis.busy_loop = any(not has_call(loop) for loop in loops)
+    return analysis
+
+
+def _llvm_mca_cycles(body):
+    """Return the cycles per iteration llvm-mca predicts for a loop body, or None on failure.
+    
+    Branches in body must target the label .Lloop at the start of the loop.
+    """
+    lines = [".Lloop:"] + [f"{mnemonic} {operands}" for mnemonic, operands in body]
+    iterations = 100
+    try:
+        # -noalias=false keeps the store-to-load dependencies that bind the -O0 loops on stack variables
+        result = subprocess.run(["llvm-mca", "-mcpu=native", f"-iterations={iterations}", "-noalias=false"],
+                                input="\n".join(lines) + "\n", capture_output=True, text=True)
+    except OSError:
+        return None
+    match = re.search(r"^Total Cycles:\s+(\d+)", result.stdout, re.MULTILINE)
+    if result.returncode != 0 or not match:
+        return None
+    # A taken branch per iteration limits loops to one iteration per cycle
+    return max(int(match.group(1)) / iterations, 1.0)
+
+
+def _simple_loop_cycles(body):
+    """Estimate cycles per iteration of a loop body from issue width and memory dependencies."""
+    issue_bound = len(body) / COST_ISSUE_WIDTH
+    # Read-modify-write of memory (e.g. a counter on the stack at -O0) chains through store forwarding
+    memory_writes = sum(1 for mnemonic, operands in body
+                        if "(" in operands.split(",")[-1] and not mnemonic.startswith(("cmp", "test")))
+    dependency_bound = memory_writes * (COST_STORE_FORWARD_LATENCY + 1) or 1.0
+    return max(issue_bound, dependency_bound, 1.0)
+
+
+def _fold_perf_script(lines, binary=None):
+    """Fold perf script output into a Counter of "root;...;leaf" stacks, streaming line by line.
+    
+    Kernel frames get a _[k] suffix and frames of other objects than binary
+    an @object suffix, e.g. clock@libc.so.6.
+    """
+    folded = collections.Counter()
+    frames = []
+    in_sample = False
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            if frames:
+                folded[";".join(reversed(frames))] += 1
+            frames = []
+            in_sample = False
+        elif not line[0].isspace():
+            # Sample header: comm, pid, time, period and event
+            in_sample = True
+        elif in_sample:
+            match = re.match(r"^\s*[0-9a-f]+\s+(.*?)\s+\((.*)\)$", line)
+            if not match:
+                continue
+            symbol = re.sub(r"\+0x[0-9a-f]+$", "", match.group(1))
+            dso = match.group(2)
+            if dso.startswith("[kernel") or dso.endswith(".ko"):
+                frames.append(f"{symbol}_[k]")
+            elif binary and os.path.basename(dso) == binary:
+                frames.append(symbol)
+            else:
+                frames.append(f"{symbol}@{os.path.basename(dso)}")
+    if frames:
+        folded[";".join(reversed(frames))] += 1
+    return folded
+
+
+def _frame_location(frame):
+    """Split an annotated folded frame into its symbol and where it lives."""
+    if frame.endswith("_[k]"):
+        return frame[:-4], "kernel"
+    symbol, at, dso = frame.rpartition("@")
+    return (symbol, dso) if at and symbol else (frame, "binary")
+
+
+def _read_folded(path):
+    """Read folded stacks ("stack count" lines), or None if the file does not exist."""
+    try:
+        with open(path) as f:
+            folded = collections.Counter()
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                folded[stack] += int(count)
+            return folded
+    except (OSError, ValueError):
+        return None
+
+
+def _write_folded(path, folded):
+    """Write folded stacks atomically in the format of Brendan Gregg's flamegraph tools."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        for stack, count in sorted(folded.items()):
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp_path, path)
+
+
+def _flame_graph_svg(folded, title, width=1200, frame_height=16):
+    """Render folded stacks as a self-contained flame graph SVG (hover a frame for details)."""
+    from xml.sax.saxutils import escape
+    
+    # Merge the stacks into a tree of [samples, children] nodes
+    root = [0, {}]
+    for stack, count in folded.items():
+        node = root
+        node[0] += count
+        for frame in stack.split(";"):
+            node = node[1].setdefault(frame, [0, {}])
+            node[0] += count
+    total = root[0] or 1
+    
+    def depth(node):
+        return 1 + max((depth(child) for child in node[1].values()), default=0)
+    
+    levels = depth(root)
+    top = 40
+    height = top + levels * frame_height + 10
+    scale = (width - 20) / total
+    colors = {"kernel": (230, 140, 40), "binary": (220, 80, 60)}
+    
+    rects = []
+    
+    def draw(name, node, x, level):
+        frame_width = node[0] * scale
+        if frame_width < 0.1:
+            return
+        y = height - 10 - (level + 1) * frame_height
+        where = _frame_location(name)[1] if level else "binary"
+        # Vary the shade per name so neighbouring frames are distinguishable
+        shade = sum(map(ord, name)) % 40
+        red, green, blue = colors.get(where, (225, 190, 60))
+        fill = f"rgb({red},{min(green + shade, 255)},{blue + shade // 2})"
+        label = escape(f"{name} ({node[0]:,} samples, {node[0] / total * 100:.2f}%)")
+        text = ""
+        max_chars = int(frame_width / 7)
+        if max_chars >= 3:
+            shown = name if len(name) <= max_chars else name[:max_chars - 2] + ".."
+            text = f'<text x="{x + 3:.1f}" y="{y + frame_height - 4}">{escape(shown)}</text>'
+        rects.append(f'<g><title>{label}</title><rect x="{x:.1f}" y="{y}" width="{frame_width:.1f}" '
+                     f'height="{frame_height - 1}" fill="{fill}" rx="2"/>{text}</g>')
+        for child_name in sorted(node[1]):
+            child = node[1][child_name]
+            draw(child_name, child, x, level + 1)
+            x += child[0] * scale
+    
+    draw("all", root, 10, 0)
+    return (f'<?xml version="1.0" standalone="no"?>\n'
+            f'<svg version="1.1" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+            f'xmlns="http://www.w3.org/2000/svg">\n'
+            f'<style>text {{ font-family: monospace; font-size: 12px; fill: #000; pointer-events: none; }}'
+            f' rect:hover {{ stroke: #000; }}</style>\n'
+            f'<rect width="100%" height="100%" fill="#f8f8f0"/>\n'
+            f'<text x="{width / 2}" y="24" text-anchor="middle" style="font-size: 16px">{escape(title)}</text>\n'
+            + "\n".join(rects) + "\n</svg>\n")
+
+
+def _parse_cpu_list(text):
+    """Parse a CPU list like "0-3,6" into a sorted list of CPU numbers."""
+    cpus = set()
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def _format_cpus(cpus):
+    """Format the CPUs runs are pinned to like "2,3", empty without pinning."""
+    return ",".join(str(cpu) for cpu in cpus or [] if cpu is not None)
+
+
+def _without_smt_siblings(cpus):
+    """Keep only one hardware thread per physical core."""
+    kept = []
+    seen_cores = set()
+    for cpu in cpus:
+        path = f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list"
+        try:
+            with open(path) as f:
+                siblings = tuple(_parse_cpu_list(f.read()))
+        except FileNotFoundError:
+            siblings = (cpu,)
+        if siblings not in seen_cores:
+            seen_cores.add(siblings)
+            kept.append(cpu)
+    return kept
+
+
+@contextlib.contextmanager
+def _pinned(cpu):
+    """Pin the calling thread to cpu so that processes spawned meanwhile inherit the affinity."""
+    if cpu is None:
+        yield
+        return
+    # On Linux pid 0 refers to the calling thread, so other threads stay unaffected
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, {cpu})
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
+
+
+def _file_hash(path):
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cpu_model():
+    """Return a human-readable CPU model name."""
+    import platform
+    
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except FileNotFoundError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def _perf_event_open(event_type, config, pid):
+    """Open a disabled counter for pid that starts on exec; None if the CPU lacks the event."""
+    import errno
+    import platform
+    
+    nr = PERF_EVENT_OPEN_SYSCALLS.get(platform.machine())
+    if nr is None:
+        raise OSError(errno.ENOSYS, f"perf_event_open is not supported on {platform.machine()}")
+    
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.syscall.restype = ctypes.c_long
+    
+    attr = PerfEventAttr()
+    attr.type = event_type
+    attr.size = ctypes.sizeof(PerfEventAttr)
+    attr.config = config
+    attr.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING
+    attr.flags = PERF_ATTR_FLAG_DISABLED | PERF_ATTR_FLAG_INHERIT | PERF_ATTR_FLAG_ENABLE_ON_EXEC
+    
+    fd = libc.syscall(nr, ctypes.byref(attr), ctypes.c_int(pid), ctypes.c_int(-1),
+                      ctypes.c_int(-1), ctypes.c_ulong(0))
+    if fd < 0 and ctypes.get_errno() in (errno.EACCES, errno.EPERM):
+        # perf_event_paranoid forbids kernel counting, fall back to user space only
+        attr.flags |= PERF_ATTR_FLAG_EXCLUDE_KERNEL | PERF_ATTR_FLAG_EXCLUDE_HV
+        fd = libc.syscall(nr, ctypes.byref(attr), ctypes.c_int(pid), ctypes.c_int(-1),
+                          ctypes.c_int(-1), ctypes.c_ulong(0))
+    if fd < 0:
+        err = ctypes.get_errno()
+        if err in (errno.ENOENT, errno.EOPNOTSUPP):
+            return None
+        raise OSError(err, f"perf_event_open failed: {os.strerror(err)}")
+    return fd
+
+
+def _run_compiler(cc, opt_level, cflags, filename, output, extra_args=None):
+    """Invoke cc for filename and return the completed process."""
+    cmd = [cc, f"-O{opt_level}"] + list(cflags) + ["-o", output, filename]
+    if extra_args:
+        cmd.extend(extra_args)
+    return subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+
+
+def _cached_build(cache_dir, key):
+    """Return the cached binary for key in cache_dir, or None if it was never built."""
+    if key is None:
+        return None
+    cached = os.path.join(cache_dir, "builds", key)
+    if not os.path.exists(cached):
+        return None
+    # Touch the entry so LRU eviction keeps recently used builds
+    os.utime(cached)
+    return cached
+
+
+def _store_build(cache_dir, max_entries, binary, key):
+    """Copy a freshly built binary into the build cache and evict entries beyond max_entries."""
+    builds_dir = os.path.join(cache_dir, "builds")
+    os.makedirs(builds_dir, exist_ok=True)
+    
+    # Copy to a temporary name first so concurrent readers never see partial files
+    _copy_atomic(binary, os.path.join(builds_dir, key))
+    
+    entries = [os.path.join(builds_dir, name) for name in os.listdir(builds_dir)
+               if not name.startswith(".")]
+    if len(entries) > max_entries:
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _copy_atomic(source, target):
+    """Copy source to target via a temporary file in the target's directory."""
+    directory, name = os.path.split(target)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def _build_worker(filename, key, cc, opt_level, cflags, extra_args, cache_dir, cache_entries,
+                  use_cache=True, output=None):
+    """Build one variant into the build cache (if use_cache) and to output (runs in a worker process).
+    
+    Returns a (success, stderr) pair.
+    """
+    import tempfile
+    
+    if key is None:
+        return False, f"{filename} or main.h not found"
+    cached = _cached_build(cache_dir, key) if use_cache else None
+    if cached:
+        if not output:
+            return True, ""
+        try:
+            _copy_atomic(cached, output)
+            return True, ""
+        except FileNotFoundError:
+            pass  # evicted by another worker in the meantime, build it again
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        binary = os.path.join(tmp_dir, os.path.splitext(os.path.basename(filename))[0])
+        try:
+            result = _run_compiler(cc, opt_level, cflags, filename, binary, extra_args)
+        except FileNotFoundError:
+            return False, f"compiler {cc} not found"
+        if result.returncode != 0:
+            return False, result.stderr
+        # Place the output before storing, a concurrent eviction may drop the cache entry right away
+        if output:
+            _copy_atomic(binary, output)
+        if use_cache:
+            _store_build(cache_dir, cache_entries, binary, key)
+    return True, ""
+
+
 def main():
     """Parse arguments and dispatch commands."""
     parser = argparse.ArgumentParser(description="Manage waste-cpu experiments")
-    parser.add_argument("command", choices=["compile", "code", "perf", "perf-all"],
+    parser.add_argument("command", choices=["compile", "code", "perf", "perf-all", "results", "compare",
+                                            "matrix", "asm", "profile"],
                         help="Command to execute")
-    parser.add_argument("filename", nargs='?', help="C file to work with (with or without .c extension, not needed for perf-all)")
+    parser.add_argument("filenames", nargs='*', metavar="filename",
+                        help="C file(s) to work with (with or without .c extension, not needed for perf-all, "
+                             "two or more for compare, all variants if omitted for matrix)")
+    parser.add_argument("--cc", default="gcc",
+                        help="Compiler to use; matrix accepts a comma-separated list like gcc,clang (default: gcc)")
     parser.add_argument("-O", "--optimize", type=int, default=3,
                         help="Optimization level (0-3, default: 3)")
-    parser.add_argument("-d", "--duration", type=int,
-                        help="Duration in seconds for perf tests (default: 10)")
+    parser.add_argument("-d", "--duration", type=float,
+                        help="Duration in seconds for perf tests, with millisecond resolution like 0.25 (default: 10)")
     parser.add_argument("-r", "--runs", type=int, default=1,
                         help="Number of times to run perf tests (default: 1)")
     parser.add_argument("--syscalls", action="store_true",
                         help="Count system calls instead of performance counters (requires root)")
+    parser.add_argument("--with-syscalls", action="store_true",
+                        help="Count system calls in the same runs as the performance counters (requires root)")
+    parser.add_argument("--wait-phase", action="store_true",
+                        help="Count only while my_wait runs, excluding program startup and exit (perf --control)")
+    parser.add_argument("--interval", type=int, metavar="MS",
+                        help="Sample the counters every MS milliseconds during each run (perf stat -I) and "
+                             "report warm-up, frequency ramp and steady-state IPC")
+    parser.add_argument("--all-syscalls", action="store_true",
+                        help="Attach every syscall tracepoint in every run instead of only the syscalls "
+                             "discovered in the first run of a variant")
+    parser.add_argument("--backend", choices=["perf", "direct"], default="perf",
+                        help="Measure via the perf tool or directly via perf_event_open (default: perf)")
+    parser.add_argument("--cpus",
+                        help="Pin runs to these CPUs, round robin (e.g. 2,3 or 4-7)")
+    parser.add_argument("--no-smt", action="store_true",
+                        help="Use only one hardware thread per core when pinning runs")
+    parser.add_argument("--target-ci", type=float,
+                        help="Adaptive mode: run until the 95%% CI of the checked metrics is within this many percent of the mean")
+    parser.add_argument("--ci-metrics",
+                        help="Comma-separated metrics checked in adaptive mode (default: cycles,time_elapsed or total_syscalls,time_elapsed)")
+    parser.add_argument("--max-runs", type=int, default=100,
+                        help="Maximum number of runs in adaptive mode (default: 100)")
+    parser.add_argument("--max-time", type=float,
+                        help="Wall-clock budget in seconds per variant in adaptive mode")
+    parser.add_argument("--stream", action="store_true",
+                        help="Aggregate runs online in constant memory and show a live-updating summary table")
+    parser.add_argument("--distribution", action="store_true",
+                        help="Also show median, P5/P95/P99 and bootstrap 95%% confidence intervals of the mean")
+    parser.add_argument("--predict", action="store_true",
+                        help="Show statically predicted next to measured IPC and instructions (llvm-mca if installed)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of runs measured concurrently by perf-all and matrix, each pinned to its own CPU (default: 1)")
+    parser.add_argument("--reserve-cpus", type=int, default=1,
+                        help="Number of CPUs kept free for housekeeping when running concurrently (default: 1)")
+    parser.add_argument("--perf-repeat", action="store_true",
+                        help="Let a single perf process repeat the runs instead of starting perf for every run")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="Significance level for compare (default: 0.05)")
+    parser.add_argument("--metric",
+                        help="Primary metric for compare's early stop (default: cycles) or the metric shown by matrix "
+                             "(default: insn_per_cycle), total_syscalls with --syscalls")
+    parser.add_argument("--opt-levels", default="0,1,2,3",
+                        help="Comma-separated optimization levels for matrix (default: 0,1,2,3)")
+    parser.add_argument("--flags", action="append", metavar="FLAGS",
+                        help="Additional compiler flag set for matrix, measured besides the plain build "
+                             "(repeatable, e.g. --flags=-march=native)")
+    parser.add_argument("--frequency", type=int, default=999,
+                        help="Sampling frequency in Hz for profile (default: 999)")
+    parser.add_argument("-o", "--output",
+                        help="Flame graph SVG written by profile (default: <variant>-flamegraph.svg)")
     parser.add_argument("--add-main", action="store_true",
                         help="Include main function in code/godbolt output (default: only includes and wait function)")
+    parser.add_argument("--session", type=int,
+                        help="Session id whose results table the results command re-renders")
+    parser.add_argument("--reuse", action="store_true",
+                        help="Reuse stored runs of the same binary, machine, duration and mode and only measure the missing runs")
+    parser.add_argument("--no-store", action="store_true",
+                        help="Do not store the runs in the results database")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always invoke the compiler instead of reusing cached builds")
     
     args = parser.parse_args()
+    if args.duration is not None and args.duration < 0.001:
+        parser.error("the duration must be at least 0.001 seconds")
+    args.filename = args.filenames[0] if args.filenames else None
+    
+    compilers = [cc.strip() for cc in args.cc.split(",") if cc.strip()]
+    if len(compilers) > 1 and args.command != "matrix":
+        print("Error: Several compilers are only supported by the matrix command")
+        return
     
     manager = WasteCpuManager()
+    manager.cc = compilers[0]
     manager.opt_level = args.optimize
+    manager.build_cache = not args.no_cache
+    manager.backend = args.backend
+    manager.store_results = not args.no_store
+    manager.reuse_results = args.reuse
+    manager.show_distribution = args.distribution
+    manager.show_prediction = args.predict
+    manager.with_syscalls = args.with_syscalls and not args.syscalls
+    manager.prune_syscalls = not args.all_syscalls
+    manager.wait_phase = args.wait_phase
+    manager.interval_ms = args.interval
+    if args.cpus:
+        manager.cpus = _parse_cpu_list(args.cpus)
+    manager.avoid_smt = args.no_smt
+    manager.reserved_cpus = args.reserve_cpus
+    if args.ci_metrics:
+        manager.ci_metrics = [metric.strip() for metric in args.ci_metrics.split(",")]
+    manager.max_time = args.max_time
+    runs = args.max_runs if args.target_ci is not None else args.runs
     if args.duration:
         manager.perf_duration = args.duration
     
-    if args.command == "perf-all":
-        manager.perf_all(args.duration, args.runs, args.syscalls)
-    elif args.command in ["compile", "code", "perf"]:
+    if args.command == "compare":
+        if len(args.filenames) < 2:
+            print("Error: compare needs at least two filenames")
+            return
+        # A fixed -r acts as the maximum number of rounds, the default allows early stopping
+        manager.compare(args.filenames, args.duration, args.runs if args.runs > 1 else args.max_runs,
+                        args.syscalls, alpha=args.alpha, metric=args.metric)
+    elif args.command == "matrix":
+        import shlex
+        opt_levels = [int(level) for level in args.opt_levels.split(",")]
+        flag_sets = [[]] + [shlex.split(flags) for flags in args.flags or []]
+        manager.matrix(args.filenames, opt_levels, flag_sets, args.duration, args.runs, args.syscalls,
+                       jobs=args.jobs, metric=args.metric, compilers=compilers)
+    elif args.command == "asm":
+        manager.show_asm(args.filenames)
+    elif args.command == "results":
+        variant = os.path.splitext(args.filename)[0] if args.filename else None
+        manager.show_results(variant, args.session)
+    elif args.command == "perf-all":
+        manager.perf_all(args.duration, runs, args.syscalls, perf_repeat=args.perf_repeat,
+                         jobs=args.jobs, target_ci=args.target_ci, stream=args.stream)
+    elif args.command in ["compile", "code", "perf", "profile"]:
         if not args.filename:
             print(f"Error: filename is required for {args.command} command")
             return
         
         if args.command == "compile":
             manager.compile(args.filename)
+        elif args.command == "profile":
+            manager.profile(args.filename, args.duration, args.frequency, args.output)
         elif args.command == "code":
             manager.show_code(args.filename, include_main=args.add_main)
         elif args.command == "perf":
-            manager.perf(args.filename, args.duration, args.runs, args.syscalls, quiet_runs=True)
+            manager.perf(args.filename, args.duration, runs, args.syscalls, quiet_runs=True,
+                         perf_repeat=args.perf_repeat, target_ci=args.target_ci, stream=args.stream)
 
 
 if __name__ == "__main__":